@@ -1,10 +1,13 @@
-from flask import Flask, request, session
+from flask import Flask, request, session, g, has_request_context
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
-from flask_babel import Babel, get_locale
+from flask_babel import Babel
 from werkzeug.security import generate_password_hash
 import os
 import secrets
+from i18n import compile_catalogs, make_translator
+from server_profile import engine_options
+from db_routing import RoutingSession, REPLICA_BIND
 
 app = Flask(__name__)
 
@@ -21,8 +24,63 @@ else:
     app.config['DEBUG'] = True
 
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+# Réplica en lecture (PostgreSQL) pour les pages de consultation ; base principale N s après une écriture
+app.config['DATABASE_REPLICA_URL'] = os.environ.get('DATABASE_REPLICA_URL')
+app.config['REPLICA_STICKY_SECONDS'] = int(os.environ.get('REPLICA_STICKY_SECONDS', 10))
 app.config['UPLOAD_FOLDER'] = 'static/images/products'
 
+# Moteur de recherche produits : 'auto', 'fts5', 'postgres' ou 'like'
+app.config['SEARCH_BACKEND'] = os.environ.get('SEARCH_BACKEND', 'auto')
+
+# Pagination : 'offset' (numéros de page) ou 'keyset' (curseurs, sans OFFSET)
+app.config['PAGINATION_MODE'] = os.environ.get('PAGINATION_MODE', 'offset')
+app.config['KEYSET_COUNT_TTL'] = int(os.environ.get('KEYSET_COUNT_TTL', 60))
+app.config['KEYSET_COUNT_CACHE_SIZE'] = int(os.environ.get('KEYSET_COUNT_CACHE_SIZE', 256))
+
+# Réservations de stock des paniers : durée de vie et intervalle de nettoyage (secondes)
+app.config['RESERVATION_TTL_MINUTES'] = int(os.environ.get('RESERVATION_TTL_MINUTES', 15))
+app.config['RESERVATION_SWEEP_INTERVAL'] = int(os.environ.get('RESERVATION_SWEEP_INTERVAL', 60))
+
+# Panier côté serveur : 'database' ou 'session' (cookie), cache LRU par processus
+app.config['CART_BACKEND'] = os.environ.get('CART_BACKEND', 'database')
+app.config['CART_CACHE_SIZE'] = int(os.environ.get('CART_CACHE_SIZE', 1024))
+app.config['CART_CACHE_TTL'] = int(os.environ.get('CART_CACHE_TTL', 5))
+
+# Identité des utilisateurs connectés : cache LRU par processus (TTL en secondes, 0 = désactivé)
+app.config['USER_CACHE_SIZE'] = int(os.environ.get('USER_CACHE_SIZE', 2048))
+app.config['USER_CACHE_TTL'] = int(os.environ.get('USER_CACHE_TTL', 30))
+
+# Compteurs du dashboard : recalcul complet au plus tard toutes les N secondes
+app.config['STATS_RECONCILE_INTERVAL'] = int(os.environ.get('STATS_RECONCILE_INTERVAL', 3600))
+
+# Exports admin : nombre de lignes lues et envoyées par lot
+app.config['EXPORT_BATCH_SIZE'] = int(os.environ.get('EXPORT_BATCH_SIZE', 1000))
+
+# Imports de catalogue : nombre de lignes insérées / mises à jour par transaction
+app.config['IMPORT_CHUNK_SIZE'] = int(os.environ.get('IMPORT_CHUNK_SIZE', 1000))
+# Seul dossier local d'où un import peut lire des images (chemins relatifs résolus ici)
+app.config['IMPORT_IMAGE_FOLDER'] = os.environ.get('IMPORT_IMAGE_FOLDER', 'imports')
+
+# Images produits : fichiers bruts en attente, intervalle du worker (secondes) et nombre d'essais
+app.config['IMAGE_RAW_FOLDER'] = os.environ.get('IMAGE_RAW_FOLDER', 'uploads/raw')
+app.config['IMAGE_WORKER_INTERVAL'] = int(os.environ.get('IMAGE_WORKER_INTERVAL', 5))
+app.config['IMAGE_JOB_MAX_ATTEMPTS'] = int(os.environ.get('IMAGE_JOB_MAX_ATTEMPTS', 3))
+app.config['IMAGE_SOURCE_MAX_BYTES'] = int(os.environ.get('IMAGE_SOURCE_MAX_BYTES', 10 * 1024 * 1024))
+
+# Cache des pages publiques (visiteurs anonymes) : 'memory' (par processus) ou 'redis' (partagé)
+app.config['PAGE_CACHE_BACKEND'] = os.environ.get('PAGE_CACHE_BACKEND', 'memory')
+app.config['PAGE_CACHE_TTL'] = int(os.environ.get('PAGE_CACHE_TTL', 60))  # 0 = désactivé
+app.config['PAGE_CACHE_SIZE'] = int(os.environ.get('PAGE_CACHE_SIZE', 512))
+app.config['PAGE_CACHE_REDIS_URL'] = os.environ.get('PAGE_CACHE_REDIS_URL', 'redis://localhost:6379/0')
+
+# SQLite : journal WAL, attente des verrous (ms), cache (Ko), mmap (octets), écritures rejouées
+app.config['SQLITE_WAL'] = os.environ.get('SQLITE_WAL', '1') == '1'
+app.config['SQLITE_BUSY_TIMEOUT'] = int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000))
+app.config['SQLITE_CACHE_SIZE_KB'] = int(os.environ.get('SQLITE_CACHE_SIZE_KB', 20000))
+app.config['SQLITE_MMAP_SIZE'] = int(os.environ.get('SQLITE_MMAP_SIZE', 128 * 1024 * 1024))
+app.config['SQLITE_WRITE_RETRIES'] = int(os.environ.get('SQLITE_WRITE_RETRIES', 3))
+
 # Configuration multilingue
 app.config['LANGUAGES'] = {
     'fr': 'Français',
@@ -32,22 +90,20 @@ app.config['LANGUAGES'] = {
 app.config['BABEL_DEFAULT_LOCALE'] = 'fr'
 app.config['BABEL_DEFAULT_TIMEZONE'] = 'UTC'
 
-# Créer le dossier d'upload s'il n'existe pas
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-
-db = SQLAlchemy(app)
+# Extensions liées à l'application par create_app()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 babel = Babel()
 login_manager = LoginManager()
-login_manager.init_app(app)
 login_manager.login_view = 'login'
 login_manager.login_message = 'Veuillez vous connecter pour accéder à cette page.'
 
 @login_manager.user_loader
 def load_user(user_id):
-    from models import User
-    return User.query.get(int(user_id))
+    # Identité légère (UserIdentity) mise en cache : pas de requête à chaque page
+    from user_cache import load_identity
+    return load_identity(int(user_id))
 
-def get_locale():
+def resolve_locale():
     # 1. Si une langue est forcée dans l'URL
     if request.args.get('lang'):
         session['language'] = request.args.get('lang')
@@ -59,19 +115,23 @@ def get_locale():
     # 3. Sinon, utiliser la langue préférée du navigateur
     return request.accept_languages.best_match(app.config['LANGUAGES'].keys()) or app.config['BABEL_DEFAULT_LOCALE']
 
+def request_locale():
+    """Langue de la requête, résolue une seule fois puis conservée sur g"""
+    if 'locale' not in g:
+        g.locale = resolve_locale()
+    return g.locale
+
 # Configurer Babel avec le sélecteur de locale
 def configure_babel():
     babel.init_app(app)
 
     # Fonction de sélection de locale pour Flask-Babel 4.0
     def locale_selector():
-        return get_locale()
+        return request_locale()
 
     # Assigner le sélecteur
     babel.locale_selector_func = locale_selector
 
-configure_babel()
-
 # Dictionnaire de traductions simple
 TRANSLATIONS = {
     'en': {
@@ -249,27 +309,34 @@ TRANSLATIONS = {
     'fr': {}  # Français = texte original
 }
 
+# Catalogues compilés par create_app() : fichiers .po complétés par TRANSLATIONS
+CATALOGS = {}
+TRANSLATORS = {}
+
+def compile_translations():
+    CATALOGS.update(compile_catalogs(os.path.join(app.root_path, 'translations'), TRANSLATIONS, app.config['LANGUAGES']))
+    TRANSLATORS.update({locale: make_translator(catalog) for locale, catalog in CATALOGS.items()})
+
+def untranslated(text):
+    return text
+
+def get_translator():
+    """Fonction de traduction de la langue de la requête (texte original hors requête)"""
+    if not has_request_context():
+        return untranslated
+    return TRANSLATORS.get(request_locale(), untranslated)
+
 # Fonction de traduction personnalisée
 def custom_gettext(text):
-    try:
-        # Vérifier directement la session
-        if 'language' in session:
-            locale = session['language']
-        else:
-            locale = request.accept_languages.best_match(app.config['LANGUAGES'].keys()) or 'fr'
-
-        if locale in TRANSLATIONS and text in TRANSLATIONS[locale]:
-            return TRANSLATIONS[locale][text]
-    except Exception:
-        pass
-    return text
+    return get_translator()(text)
 
 # Rendre les fonctions de traduction disponibles dans tous les templates
 @app.context_processor
 def inject_conf_vars():
     return {
-        '_': custom_gettext,
-        'get_locale': get_locale,
+        # Traducteur déjà lié à la langue : chaque appel dans le template est un dict.get
+        '_': get_translator(),
+        'get_locale': request_locale,
         'LANGUAGES': app.config['LANGUAGES']
     }
 
@@ -277,9 +344,13 @@ def init_db():
     """Initialise la base de données et crée l'admin par défaut"""
     # Import ici pour éviter les imports circulaires
     from models import User
+    from search import init_search_index
+    from migrations import run_migrations
 
     with app.app_context():
         db.create_all()
+        run_migrations()
+        init_search_index()
         # Créer un admin par défaut
         admin = User.query.filter_by(email='admin@velours-parfum.com').first()
         if not admin:
@@ -292,13 +363,62 @@ def init_db():
             db.session.add(admin)
             db.session.commit()
 
-# Import des modèles et routes ici pour éviter les imports circulaires
-from models import User, Product, Order, OrderItem, Category
-from routes import *
+@app.cli.command('init-db')
+def init_db_command():
+    """Crée le schéma, applique les migrations et crée l'admin par défaut"""
+    init_db()
+    print("✅ Base de données initialisée")
+
+_created = False
+
+def create_app(config=None):
+    """Configure l'application et enregistre extensions et routes, sans toucher à la base.
+
+    Le schéma est créé explicitement : `flask --app wsgi init-db`, init_db(), ou le
+    hook on_starting de gunicorn. Un seul appel configure l'application du processus ;
+    les suivants la retournent telle quelle.
+    """
+    global _created
+    if _created:
+        if config:
+            raise RuntimeError("create_app() a déjà été appelé : configuration figée")
+        return app
+
+    app.config.update(config or {})
+    # Pool de connexions dimensionné selon le profil gunicorn (SERVER_PROFILE, WEB_THREADS)
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config['SQLALCHEMY_DATABASE_URI']))
+    if app.config['DATABASE_REPLICA_URL']:
+        app.config.setdefault('SQLALCHEMY_BINDS', {
+            REPLICA_BIND: dict(url=app.config['DATABASE_REPLICA_URL'],
+                               **engine_options(app.config['DATABASE_REPLICA_URL'])),
+        })
+
+    # Créer le dossier d'upload s'il n'existe pas
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+
+    db.init_app(app)
+    login_manager.init_app(app)
+    configure_babel()
+    compile_translations()
+
+    # Import des modèles et routes ici pour éviter les imports circulaires
+    from sqlite_mode import configure_sqlite
+    with app.app_context():
+        configure_sqlite(db.engine)  # Pragmas SQLite (WAL, busy_timeout) avant la première connexion
+    import models
+    import routes
+    import assets  # Fichiers CSS / JS empreintés et précompressés (route /assets)
+    assets.load_assets()
 
-# Initialiser la base de données
-init_db()
+    _created = True
+    return app
 
 if __name__ == '__main__':
     # Pour le développement local uniquement
+    create_app()
+    init_db()
+    from reservations import start_sweeper
+    from image_jobs import start_worker
+    start_sweeper()
+    start_worker()
     app.run(debug=True, port=5001)
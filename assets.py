@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Fichiers statiques empreintés (CSS / JS) avec variantes gzip et Brotli
+
+Au démarrage, chaque fichier de ASSET_DIRS est copié dans static/dist sous un
+nom contenant l'empreinte de son contenu (style.3f2a9c1b7d4e.css), accompagné
+de ses versions précompressées .gz et .br. Les templates utilisent
+asset_url('css/style.css') à la place de url_for('static', ...) : l'URL
+change dès que le fichier change, elle peut donc être mise en cache un an
+sans revalidation.
+"""
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+from flask import request, send_from_directory, url_for, abort
+from app import app
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ASSET_DIRS = ('css', 'js')
+DIST_DIR = 'dist'
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# Nom logique -> nom empreinté, ex. {'css/style.css': 'css/style.3f2a9c1b7d4e.css'}
+_manifest = {}
+
+
+def _dist_path(*parts):
+    return os.path.join(app.static_folder, DIST_DIR, *parts)
+
+
+def _tmp(path):
+    """Fichier temporaire propre au processus : les workers construisent en même temps"""
+    return f"{path}.{os.getpid()}.tmp"
+
+
+def _write(path, data):
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(_tmp(path), 'wb') as f:
+            f.write(data)
+        os.replace(_tmp(path), path)
+
+
+def build_assets():
+    """Empreinte et précompresse les fichiers de ASSET_DIRS ; retourne le manifeste"""
+    manifest = {}
+    os.makedirs(_dist_path(), exist_ok=True)
+    for directory in ASSET_DIRS:
+        root = os.path.join(app.static_folder, directory)
+        for dirpath, _, filenames in os.walk(root):
+            for filename in sorted(filenames):
+                source = os.path.join(dirpath, filename)
+                logical = os.path.relpath(source, app.static_folder).replace(os.sep, '/')
+                with open(source, 'rb') as f:
+                    data = f.read()
+
+                stem, ext = os.path.splitext(logical)
+                hashed = f"{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}"
+                target = _dist_path(hashed)
+                _write(target, data)
+                _write(target + '.gz', gzip.compress(data, compresslevel=9, mtime=0))
+                if brotli is not None:
+                    _write(target + '.br', brotli.compress(data, quality=11))
+                manifest[logical] = hashed
+
+    with open(_tmp(_dist_path('manifest.json')), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(_tmp(_dist_path('manifest.json')), _dist_path('manifest.json'))
+    return manifest
+
+
+def load_assets():
+    """Construit les fichiers (create_app) ; sur un disque en lecture seule, relit le manifeste"""
+    global _manifest
+    try:
+        _manifest = build_assets()
+    except OSError as e:
+        try:
+            with open(_dist_path('manifest.json')) as f:
+                _manifest = json.load(f)
+        except (OSError, ValueError):
+            _manifest = {}
+        app.logger.warning(f"Empreinte des fichiers statiques impossible : {e}")
+    return _manifest
+
+
+@app.template_global()
+def asset_url(filename):
+    """URL empreintée d'un fichier statique, ou URL /static classique s'il n'est pas construit"""
+    hashed = _manifest.get(filename)
+    if hashed is None:
+        return url_for('static', filename=filename)
+    return url_for('assets', filename=hashed)
+
+
+@app.route('/assets/<path:filename>')
+def assets(filename):
+    """Sert la variante précompressée acceptée par le navigateur, en cache immuable"""
+    if filename not in _manifest.values():
+        abort(404)
+
+    accepted = request.accept_encodings
+    encoding = None
+    for suffix, name in (('.br', 'br'), ('.gz', 'gzip')):
+        if accepted[name] and os.path.exists(_dist_path(filename + suffix)):
+            encoding = (suffix, name)
+            break
+
+    mimetype = mimetypes.guess_type(filename)[0]
+    response = send_from_directory(_dist_path(), filename + (encoding[0] if encoding else ''),
+                                   mimetype=mimetype, conditional=True)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding[1]
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.max_age = IMMUTABLE_MAX_AGE
+    response.cache_control.immutable = True
+    response.cache_control.no_cache = None
+    return response
+
+
+if __name__ == '__main__':
+    _manifest = build_assets()
+    for logical, hashed in sorted(_manifest.items()):
+        variants = [suffix for suffix in ('.gz', '.br') if os.path.exists(_dist_path(hashed + suffix))]
+        print(f"✅ {logical} -> {DIST_DIR}/{hashed} ({', '.join(variants) or 'sans compression'})")
+    if brotli is None:
+        print("⚠️  Module brotli absent : variantes .br non générées (pip install brotli)")
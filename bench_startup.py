@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Benchmark du démarrage : import de app, create_app() et première requête
+
+Chaque mesure tourne dans un interpréteur neuf, comme un worker qui démarre.
+Avec --save, le résultat est ajouté à bench_startup.jsonl (non versionné) et
+comparé à la mesure précédente, pour suivre l'évolution en local.
+
+    python bench_startup.py --runs 5 --save
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+HISTORY_FILE = 'bench_startup.jsonl'
+
+PROBE = r'''
+import json, sys, time
+start = time.perf_counter()
+import app as app_module
+imported = time.perf_counter()
+application = app_module.create_app()
+created = time.perf_counter()
+response = application.test_client().get('/')
+served = time.perf_counter()
+print(json.dumps({
+    'import': imported - start,
+    'create_app': created - imported,
+    'first_request': served - created,
+    'status': response.status_code,
+    'modules': len(sys.modules),
+    'pil_loaded': 'PIL.Image' in sys.modules,
+}))
+'''
+
+STEPS = ('import', 'create_app', 'first_request')
+
+
+def measure():
+    output = subprocess.run([sys.executable, '-c', PROBE], capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def last_saved():
+    if not os.path.exists(HISTORY_FILE):
+        return None
+    with open(HISTORY_FILE) as f:
+        lines = [line for line in f if line.strip()]
+    return json.loads(lines[-1]) if lines else None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Temps de démarrage de l'application")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--save', action='store_true', help=f"ajouter le résultat à {HISTORY_FILE}")
+    args = parser.parse_args()
+
+    measure()  # premier lancement hors mesure : fichiers .pyc, assets, cache disque
+    runs = [measure() for _ in range(args.runs)]
+    result = {step: statistics.median(run[step] for run in runs) * 1000 for step in STEPS}
+    result['total'] = sum(result[step] for step in STEPS)
+    result['modules'] = runs[-1]['modules']
+    result['pil_loaded'] = runs[-1]['pil_loaded']
+
+    previous = last_saved()
+    print(f"🚀 Démarrage (médiane de {args.runs} processus)")
+    for step in STEPS + ('total',):
+        delta = f" ({result[step] - previous[step]:+.0f} ms)" if previous else ''
+        print(f"   {step:<14}{result[step]:8.0f} ms{delta}")
+    print(f"   {result['modules']} modules chargés, Pillow {'chargé' if result['pil_loaded'] else 'non chargé'}")
+    if any(run['status'] != 200 for run in runs):
+        print("⚠️  La première requête n'a pas répondu 200 : base initialisée ? (flask --app wsgi init-db)")
+
+    if args.save:
+        result['date'] = time.strftime('%Y-%m-%d %H:%M:%S')
+        with open(HISTORY_FILE, 'a') as f:
+            f.write(json.dumps(result) + '\n')
+        print(f"✅ Résultat ajouté à {HISTORY_FILE}")
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Benchmark du coût des traductions par rendu de template
+
+Compare l'ancienne fonction de traduction (session + best_match des langues
+du navigateur à chaque chaîne) aux catalogues compilés (langue résolue une
+fois par requête, dict.get par chaîne).
+"""
+
+import re
+import time
+from flask import request, session, render_template_string
+from app import app, create_app, TRANSLATIONS, get_translator
+
+RENDERS = 200
+
+
+def legacy_gettext(text):
+    """Ancienne implémentation de custom_gettext, conservée pour comparaison"""
+    try:
+        if 'language' in session:
+            locale = session['language']
+        else:
+            locale = request.accept_languages.best_match(app.config['LANGUAGES'].keys()) or 'fr'
+        if locale in TRANSLATIONS and text in TRANSLATIONS[locale]:
+            return TRANSLATIONS[locale][text]
+    except Exception:
+        pass
+    return text
+
+
+def benchmark_template():
+    """Template reprenant les chaînes traduites de admin/users.html, répétées comme dans une liste"""
+    with open('templates/admin/users.html', encoding='utf-8') as f:
+        strings = re.findall(r"_\('([^']+)'\)", f.read())
+    row = ''.join(f"{{{{ _({text!r}) }}}}" for text in strings)
+    return '{% for i in range(20) %}' + row + '{% endfor %}', len(strings) * 20
+
+
+def time_renders(source, **context):
+    with app.test_request_context('/', headers={'Accept-Language': 'en-US,en;q=0.9,fr;q=0.8'}):
+        render_template_string(source, **context)  # compilation du template hors mesure
+        start = time.perf_counter()
+        for _ in range(RENDERS):
+            render_template_string(source, **context)
+        return (time.perf_counter() - start) / RENDERS * 1000
+
+
+def time_calls(calls=100000):
+    """Coût unitaire d'un appel de traduction, hors rendu (microsecondes)"""
+    with app.test_request_context('/', headers={'Accept-Language': 'en-US,en;q=0.9,fr;q=0.8'}):
+        results = []
+        for translate in (legacy_gettext, get_translator()):
+            start = time.perf_counter()
+            for _ in range(calls):
+                translate('Produits')
+            results.append((time.perf_counter() - start) / calls * 1e6)
+        return results
+
+
+if __name__ == '__main__':
+    create_app()
+    source, calls = benchmark_template()
+    print(f"🌍 {calls} appels à _() par rendu, {RENDERS} rendus")
+
+    legacy = time_renders(source, _=legacy_gettext)
+    compiled = time_renders(source)
+
+    print(f"   Ancienne traduction : {legacy:.2f} ms / rendu")
+    print(f"   Catalogues compilés : {compiled:.2f} ms / rendu")
+    print(f"✅ Gain : x{legacy / compiled:.1f}")
+
+    legacy_call, compiled_call = time_calls()
+    print(f"   Par appel : {legacy_call:.2f} µs -> {compiled_call:.2f} µs")
@@ -0,0 +1,88 @@
+"""
+Calcul du panier : chargement groupé des produits et des totaux
+"""
+
+from datetime import datetime
+from sqlalchemy import update, case
+from app import db
+from models import Product
+from reservations import reserved_subquery
+
+
+def load_products(product_ids):
+    """Charge les produits demandés en une seule requête IN (...) ; {id: Product}"""
+    ids = {int(product_id) for product_id in product_ids}
+    if not ids:
+        return {}
+    return {product.id: product for product in Product.query.filter(Product.id.in_(ids)).all()}
+
+
+class PricedCart:
+    """Lignes du panier avec sous-totaux et total, calculés en une passe"""
+
+    def __init__(self, lines, missing):
+        self.lines = lines
+        self.missing = missing
+        self.total = sum(line['subtotal'] for line in lines)
+        self.count = sum(line['quantity'] for line in lines)
+        self._by_id = {line['product'].id: line for line in lines}
+
+    def line(self, product_id):
+        return self._by_id.get(int(product_id))
+
+    def out_of_stock(self):
+        """Lignes dont la quantité dépasse le stock actuel"""
+        return [line for line in self.lines if line['product'].stock < line['quantity']]
+
+
+def price_cart(cart):
+    """Construit un PricedCart à partir du panier {product_id: quantité}"""
+    products = load_products(cart.keys())
+    lines = []
+    missing = []
+
+    for product_id, quantity in cart.items():
+        product = products.get(int(product_id))
+        if product is None:
+            missing.append(product_id)
+            continue
+        lines.append({
+            'product': product,
+            'quantity': quantity,
+            'price': product.price,
+            'subtotal': product.price * quantity
+        })
+
+    return PricedCart(lines, missing)
+
+
+def decrement_stock(priced, user_id=None):
+    """Décrémente le stock de toutes les lignes ; retourne les lignes en échec (vide = succès)"""
+    quantities = {line['product'].id: line['quantity'] for line in priced.lines}
+    if not quantities:
+        return []
+
+    # UPDATE ... SET stock = stock - q WHERE stock - réservé >= q : vérification et
+    # écriture atomiques, deux commandes simultanées ne peuvent pas survendre et le
+    # stock retenu pour les paniers des autres utilisateurs n'est pas consommé
+    requested = case(quantities, value=Product.id)
+    available = Product.stock - reserved_subquery(Product.id, exclude_user_id=user_id)
+    result = db.session.execute(
+        update(Product)
+        .where(Product.id.in_(quantities.keys()), available >= requested)
+        .values(stock=Product.stock - requested, updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == len(quantities):
+        return []
+
+    # Au moins une ligne a échoué : on annule tout et on indique lesquelles
+    names = {line['product'].id: line['product'].name for line in priced.lines}
+    db.session.rollback()
+    stock = dict(db.session.query(Product.id, available).filter(Product.id.in_(quantities.keys())).all())
+    lines = [
+        {'name': names[product_id], 'quantity': quantity, 'available': stock.get(product_id, 0)}
+        for product_id, quantity in quantities.items()
+    ]
+    # Stock libéré entre-temps (réservation, réassort) : rien n'a été décrémenté, jamais de succès ici
+    return [line for line in lines if line['available'] < line['quantity']] or lines
@@ -0,0 +1,187 @@
+"""
+Stockage du panier côté serveur (base de données + cache LRU en mémoire)
+"""
+
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from flask import session
+from sqlalchemy import event
+from app import app, db
+from models import CartItem
+
+
+class CartBackend(ABC):
+    """Interface commune : un panier est un dict {product_id (str): quantité}"""
+
+    @abstractmethod
+    def load(self, user_id):
+        """Panier de l'utilisateur"""
+
+    @abstractmethod
+    def set_quantity(self, user_id, product_id, quantity):
+        """Fixe la quantité d'un produit"""
+
+    @abstractmethod
+    def remove(self, user_id, product_id):
+        """Retire un produit du panier"""
+
+    @abstractmethod
+    def clear(self, user_id):
+        """Vide le panier"""
+
+
+class DatabaseCartBackend(CartBackend):
+    """Table cart_item : le panier suit l'utilisateur sur tous ses appareils (sans commit)"""
+
+    def load(self, user_id):
+        rows = db.session.query(CartItem.product_id, CartItem.quantity).filter_by(user_id=user_id).all()
+        return {str(product_id): quantity for product_id, quantity in rows}
+
+    def set_quantity(self, user_id, product_id, quantity):
+        item = db.session.get(CartItem, (user_id, int(product_id)))
+        if item is None:
+            db.session.add(CartItem(user_id=user_id, product_id=int(product_id), quantity=quantity))
+        else:
+            item.quantity = quantity
+
+    def remove(self, user_id, product_id):
+        CartItem.query.filter_by(user_id=user_id, product_id=int(product_id)).delete(synchronize_session=False)
+
+    def clear(self, user_id):
+        CartItem.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+
+
+class SessionCartBackend(CartBackend):
+    """Ancien comportement : panier dans le cookie de session signé"""
+
+    def load(self, user_id):
+        return dict(session.get('cart', {}))
+
+    def set_quantity(self, user_id, product_id, quantity):
+        cart = session.get('cart', {})
+        cart[str(product_id)] = quantity
+        session['cart'] = cart
+
+    def remove(self, user_id, product_id):
+        cart = session.get('cart', {})
+        cart.pop(str(product_id), None)
+        session['cart'] = cart
+
+    def clear(self, user_id):
+        session.pop('cart', None)
+
+
+# Clé de session.info : utilisateurs dont le panier a été modifié dans la transaction
+TOUCHED_CARTS = 'touched_carts'
+
+
+class CachedCartBackend(CartBackend):
+    """Cache LRU par processus devant un autre backend.
+
+    Chaque écriture invalide l'entrée du processus courant, une première fois
+    aussitôt puis après le commit (ou l'annulation) : un autre thread qui a relu
+    l'ancien panier entre-temps ne le laisse pas en cache. Les autres workers
+    peuvent servir un panier périmé pendant au plus CART_CACHE_TTL secondes,
+    d'où load(fresh=True) pour le checkout.
+    """
+
+    def __init__(self, backend, max_size, ttl):
+        self.backend = backend
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, user_id, fresh=False):
+        now = time.monotonic()
+        if not fresh:
+            with self._lock:
+                entry = self._entries.get(user_id)
+                if entry and entry[0] > now:
+                    self._entries.move_to_end(user_id)
+                    return dict(entry[1])
+
+        cart = self.backend.load(user_id)
+        with self._lock:
+            self._entries[user_id] = (now + self.ttl, cart)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return dict(cart)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def _touch(self, user_id):
+        """Invalide maintenant et à la fin de la transaction en cours"""
+        self.invalidate(user_id)
+        db.session.info.setdefault(TOUCHED_CARTS, set()).add(user_id)
+
+    def set_quantity(self, user_id, product_id, quantity):
+        self._touch(user_id)
+        self.backend.set_quantity(user_id, product_id, quantity)
+
+    def remove(self, user_id, product_id):
+        self._touch(user_id)
+        self.backend.remove(user_id, product_id)
+
+    def clear(self, user_id):
+        self._touch(user_id)
+        self.backend.clear(user_id)
+
+
+CART_BACKENDS = {
+    'database': DatabaseCartBackend,
+    'session': SessionCartBackend,
+}
+
+_store = None
+_store_lock = threading.Lock()
+
+
+@event.listens_for(db.session, 'after_commit')
+@event.listens_for(db.session, 'after_rollback')
+def invalidate_touched_carts(session):
+    """Transaction terminée : les paniers modifiés sont relus depuis la base"""
+    touched = session.info.pop(TOUCHED_CARTS, None)
+    if touched and isinstance(_store, CachedCartBackend):
+        for user_id in touched:
+            _store.invalidate(user_id)
+
+
+def get_cart_store():
+    """Backend configuré par CART_BACKEND, avec le cache LRU si CART_CACHE_SIZE > 0"""
+    global _store
+    if _store is None:
+        # Un seul cache par processus, même si plusieurs threads arrivent en même temps
+        with _store_lock:
+            if _store is None:
+                store = CART_BACKENDS[app.config['CART_BACKEND']]()
+                if app.config['CART_CACHE_SIZE'] > 0 and not isinstance(store, SessionCartBackend):
+                    store = CachedCartBackend(store, app.config['CART_CACHE_SIZE'], app.config['CART_CACHE_TTL'])
+                _store = store
+    return _store
+
+
+def get_cart(user_id, fresh=False):
+    """Panier de l'utilisateur ; reprend une fois l'ancien panier du cookie s'il existe"""
+    store = get_cart_store()
+    legacy = session.pop('cart', None) if not isinstance(store, SessionCartBackend) else None
+    if legacy:
+        current = store.load(user_id)
+        for product_id, quantity in legacy.items():
+            store.set_quantity(user_id, product_id, current.get(product_id, 0) + quantity)
+        db.session.commit()
+        fresh = True
+
+    if fresh and isinstance(store, CachedCartBackend):
+        return store.load(user_id, fresh=True)
+    return store.load(user_id)
+
+
+def cart_item_count(user_id):
+    """Nombre d'articles, servi par le cache sans requête quand il est chaud"""
+    return sum(get_cart(user_id).values())
@@ -0,0 +1,51 @@
+"""
+Réponses conditionnelles (ETag / Last-Modified) pour les pages du catalogue
+
+La vue calcule d'abord quelques valeurs bon marché qui décrivent sa page
+(dates de modification, compteurs, stock) ; si le navigateur possède déjà
+cette version, elle répond 304 sans charger le reste ni rendre le template.
+"""
+
+import hashlib
+from datetime import timezone
+from flask import request, session, make_response
+from flask_login import current_user
+from app import request_locale
+
+
+class PageValidators:
+    """ETag et Last-Modified d'une page, dérivés de l'état qui la compose"""
+
+    def __init__(self, *parts, last_modified=None):
+        self.last_modified = last_modified.replace(microsecond=0) if last_modified else None
+        # La page dépend aussi de la langue, de l'utilisateur et des paramètres de l'URL
+        viewer = current_user.get_id() if current_user.is_authenticated else None
+        raw = repr((parts, self.last_modified, request_locale(), viewer, request.full_path))
+        self.etag = hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def is_fresh(self):
+        """Vrai si la copie du navigateur est à jour (If-None-Match, sinon If-Modified-Since)"""
+        if '_flashes' in session:
+            return False  # messages à afficher : la page doit être rendue
+        if request.if_none_match:
+            return request.if_none_match.contains_weak(self.etag)
+        if request.if_modified_since and self.last_modified:
+            return self.last_modified.replace(tzinfo=timezone.utc) <= request.if_modified_since
+        return False
+
+    def apply(self, response):
+        response.set_etag(self.etag, weak=True)
+        if self.last_modified:
+            response.last_modified = self.last_modified.replace(tzinfo=timezone.utc)
+        # Le navigateur garde la page mais revalide à chaque visite
+        response.cache_control.no_cache = True
+        if current_user.is_authenticated:
+            response.cache_control.private = True
+        response.vary.add('Cookie')
+        return response
+
+    def not_modified(self):
+        return self.apply(make_response('', 304))
+
+    def respond(self, body):
+        return self.apply(make_response(body))
@@ -0,0 +1,90 @@
+"""
+Routage lecture / écriture entre la base principale et un réplica en lecture
+
+Si DATABASE_REPLICA_URL est défini, les vues décorées par @read_replica lisent
+sur le réplica ; tout le reste (écritures, vues non décorées, threads de fond)
+reste sur la base principale. Dans une même transaction, dès qu'une écriture a
+eu lieu, les lectures suivantes repassent sur la base principale.
+
+Lecture de ses propres écritures : après un commit qui a écrit, le navigateur
+lit sur la base principale pendant REPLICA_STICKY_SECONDS, le temps que le
+réplica rattrape son retard.
+
+Ce module ne doit pas importer app : la classe de session est passée à SQLAlchemy().
+"""
+
+import time
+from contextlib import contextmanager
+from functools import wraps
+from flask import current_app, g, has_request_context, session as flask_session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.sql.dml import UpdateBase
+
+REPLICA_BIND = 'replica'
+STICKY_KEY = '_db_primary_until'
+
+
+def _replica_allowed():
+    if not has_request_context() or not g.get('db_read_replica'):
+        return False
+    return flask_session.get(STICKY_KEY, 0) <= time.time()
+
+
+class RoutingSession(Session):
+    """Session Flask-SQLAlchemy qui envoie les lectures des vues @read_replica au réplica"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None
+                and REPLICA_BIND in self._db.engines
+                and not self._flushing
+                and not isinstance(clause, UpdateBase)
+                and not self.info.get('wrote')
+                and _replica_allowed()):
+            return self._db.engines[REPLICA_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _flushed(session, flush_context):
+    session.info['wrote'] = True
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _bulk_write(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info['wrote'] = True
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _committed(session):
+    if session.info.pop('wrote', False) and has_request_context() and REPLICA_BIND in session._db.engines:
+        flask_session[STICKY_KEY] = time.time() + current_app.config['REPLICA_STICKY_SECONDS']
+
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def _rolled_back(session):
+    session.info.pop('wrote', None)
+
+
+def read_replica(view):
+    """Vue de consultation : ses lectures peuvent être servies par le réplica"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.db_read_replica = True
+        return view(*args, **kwargs)
+    return wrapper
+
+
+@contextmanager
+def use_primary():
+    """Force la base principale (lectures servant à calculer une écriture)"""
+    if not has_request_context():
+        yield
+        return
+    previous = g.get('db_read_replica', False)
+    g.db_read_replica = False
+    try:
+        yield
+    finally:
+        g.db_read_replica = previous
@@ -0,0 +1,118 @@
+"""
+Exports CSV / JSON en flux (mémoire constante) des commandes, utilisateurs et produits
+"""
+
+import csv
+import io
+import json
+from datetime import datetime
+from sqlalchemy import select
+from app import app, db
+from models import User, Product, Order, OrderItem, Category
+
+
+def orders_statement():
+    # Une ligne par article, triée par commande pour regrouper les articles en JSON
+    return (select(Order.id.label('order_id'), Order.created_at, Order.status, Order.total_amount,
+                   Order.shipping_address, Order.phone, User.username, User.email,
+                   OrderItem.product_id, Product.name.label('product_name'),
+                   OrderItem.quantity, OrderItem.price)
+            .join(User, User.id == Order.user_id)
+            .outerjoin(OrderItem, OrderItem.order_id == Order.id)
+            .outerjoin(Product, Product.id == OrderItem.product_id)
+            .order_by(Order.id, OrderItem.id))
+
+
+def users_statement():
+    return (select(User.id, User.username, User.email, User.is_admin, User.created_at)
+            .order_by(User.id))
+
+
+def products_statement():
+    return (select(Product.id, Product.name, Product.brand, Product.volume, Product.gender,
+                   Product.price, Product.stock, Product.is_active,
+                   Category.name.label('category'), Product.created_at)
+            .outerjoin(Category, Category.id == Product.category_id)
+            .order_by(Product.id))
+
+
+EXPORTS = {
+    'orders': orders_statement,
+    'users': users_statement,
+    'products': products_statement,
+}
+
+ORDER_ITEM_FIELDS = ('product_id', 'product_name', 'quantity', 'price')
+
+
+def _value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def iter_rows(statement):
+    """Parcourt le résultat par lots (curseur serveur sur Postgres) sans tout charger"""
+    result = db.session.execute(statement.execution_options(
+        stream_results=True, yield_per=app.config['EXPORT_BATCH_SIZE']
+    ))
+    for partition in result.partitions():
+        yield from partition
+
+
+def stream_csv(statement):
+    """Générateur de lignes CSV, envoyées par paquets de EXPORT_BATCH_SIZE lignes"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=';')
+    buffer.write('\ufeff')  # BOM pour l'ouverture correcte des accents dans Excel
+    writer.writerow([column.key for column in statement.selected_columns])
+    pending = 0
+
+    for row in iter_rows(statement):
+        writer.writerow([_value(v) for v in row])
+        pending += 1
+        if pending >= app.config['EXPORT_BATCH_SIZE']:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+
+    yield buffer.getvalue()
+
+
+def stream_json(statement, group_items=False):
+    """Générateur d'un tableau JSON ; les commandes regroupent leurs articles"""
+    yield '['
+    columns = [column.key for column in statement.selected_columns]
+    first = True
+    current = None
+
+    def dump(obj):
+        return ('' if first else ',') + '\n' + json.dumps(obj, ensure_ascii=False)
+
+    for row in iter_rows(statement):
+        data = {column: _value(value) for column, value in zip(columns, row)}
+        if not group_items:
+            yield dump(data)
+            first = False
+            continue
+
+        item = {field: data.pop(field) for field in ORDER_ITEM_FIELDS}
+        if current is not None and current['order_id'] != data['order_id']:
+            yield dump(current)
+            first = False
+            current = None
+        if current is None:
+            current = dict(data, items=[])
+        if item['product_id'] is not None:
+            current['items'].append(item)
+
+    if current is not None:
+        yield dump(current)
+    yield '\n]\n'
+
+
+def stream_export(kind, fmt):
+    """Retourne (générateur, type MIME) pour un export donné"""
+    statement = EXPORTS[kind]()
+    if fmt == 'csv':
+        return stream_csv(statement), 'text/csv'
+    return stream_json(statement, group_items=(kind == 'orders')), 'application/json'
@@ -1,16 +1,44 @@
 import os
+import server_profile
+
+# Profil de concurrence : SERVER_PROFILE = 'sync', 'gthread' (par défaut) ou 'gevent'
+profile = server_profile.server_profile()
+if profile == 'gevent':
+    # Avant preload_app : les verrous et threads de l'application doivent être coopératifs
+    from gevent import monkey
+    monkey.patch_all()
 
 # Configuration Gunicorn pour Railway
 bind = f"0.0.0.0:{os.environ.get('PORT', 8080)}"
 workers = int(os.environ.get('WEB_CONCURRENCY', 1))
-worker_class = "sync"
-worker_connections = 1000
-max_requests = 1000
+worker_class = server_profile.worker_class(profile)
+threads = server_profile.worker_threads(profile)
+worker_connections = server_profile.worker_connections()
+max_requests = int(os.environ.get('MAX_REQUESTS', 1000))  # 0 = jamais de recyclage
 max_requests_jitter = 100
 timeout = 30
 keepalive = 2
 preload_app = True
 
+def on_starting(server):
+    # Schéma, migrations et admin par défaut : une seule fois, dans le maître
+    from app import create_app, init_db
+    create_app()
+    init_db()
+
+def post_fork(server, worker):
+    # Connexions ouvertes par le maître pendant preload_app : jamais partagées entre processus
+    from app import app, create_app, db
+    create_app()
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+    # Nettoyage des réservations de panier expirées et traitement des images, un thread par worker
+    from reservations import start_sweeper
+    from image_jobs import start_worker
+    start_sweeper()
+    start_worker()
+
 # Logging
 accesslog = "-"
 errorlog = "-"
@@ -0,0 +1,43 @@
+"""
+Catalogues de traduction compilés au démarrage
+
+Les fichiers translations/<langue>/LC_MESSAGES/messages.po et le dictionnaire
+TRANSLATIONS de app.py sont fusionnés une fois pour toutes en un dictionnaire
+par langue ; traduire une chaîne revient ensuite à un simple dict.get.
+"""
+
+import os
+from babel.messages.pofile import read_po
+
+
+def read_po_catalog(path):
+    """{msgid: msgstr} d'un fichier .po, sans les entrées vides ni approximatives (fuzzy)"""
+    with open(path, 'rb') as f:
+        catalog = read_po(f)
+    return {
+        message.id: message.string
+        for message in catalog
+        if message.id and isinstance(message.id, str) and message.string and not message.fuzzy
+    }
+
+
+def compile_catalogs(translations_dir, overrides, locales):
+    """Un catalogue par langue : .po d'abord, complétés et corrigés par `overrides`"""
+    catalogs = {}
+    for locale in locales:
+        catalog = {}
+        po_file = os.path.join(translations_dir, locale, 'LC_MESSAGES', 'messages.po')
+        if os.path.exists(po_file):
+            catalog.update(read_po_catalog(po_file))
+        catalog.update(overrides.get(locale, {}))
+        catalogs[locale] = catalog
+    return catalogs
+
+
+def make_translator(catalog):
+    """Fonction de traduction liée à un catalogue : text -> traduction ou text"""
+    lookup = catalog.get
+
+    def translate(text):
+        return lookup(text, text)
+    return translate
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+File de traitement des images produits (tâches stockées en base)
+
+Les fichiers envoyés sont enregistrés bruts dans IMAGE_RAW_FOLDER puis traités
+par un thread de fond (un par processus, ou un worker dédié lancé avec
+`python image_jobs.py`) : la requête HTTP ne décode ni ne redimensionne plus
+d'image. Tant que la tâche n'est pas terminée, le produit garde son ancienne
+image ou l'emplacement vide du catalogue.
+"""
+
+import io
+import os
+import threading
+import time
+import urllib.request
+import uuid
+from datetime import datetime, timedelta
+from urllib.parse import urlparse
+from sqlalchemy import or_, update
+from werkzeug.utils import secure_filename
+from app import app, create_app, db
+from models import ImageJob, Product
+from images import save_product_image, release_product_image, restore_released_image
+
+_worker = None
+_wakeup = threading.Event()
+
+
+def store_raw_upload(file):
+    """Enregistre un fichier envoyé tel quel, sans le décoder ; retourne son chemin"""
+    os.makedirs(app.config['IMAGE_RAW_FOLDER'], exist_ok=True)
+    filename = f"{uuid.uuid4().hex}_{secure_filename(file.filename)}"
+    path = os.path.join(app.config['IMAGE_RAW_FOLDER'], filename)
+    file.save(path)
+    return path
+
+
+def queue_image(product_id, source):
+    """Ajoute une tâche de traitement d'image pour un produit (sans commit)"""
+    job = ImageJob(product_id=product_id, source=source)
+    db.session.add(job)
+    return job
+
+
+def wake_worker():
+    """Réveille le thread de traitement du processus après un commit de tâches"""
+    _wakeup.set()
+
+
+def pending_image_products(product_ids):
+    """Produits de la liste dont une image est en attente de traitement"""
+    product_ids = list(product_ids)
+    if not product_ids:
+        return set()
+    return {product_id for (product_id,) in db.session.query(ImageJob.product_id).filter(
+        ImageJob.product_id.in_(product_ids),
+        ImageJob.status.in_(('pending', 'processing'))
+    ).distinct()}
+
+
+class _HTTPOnlyRedirectHandler(urllib.request.HTTPRedirectHandler):
+    """Redirections suivies uniquement vers http(s) (urllib accepte aussi ftp)"""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        if urlparse(newurl).scheme not in ('http', 'https'):
+            raise ValueError(f"Redirection non autorisée : {newurl}")
+        return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+
+_url_opener = urllib.request.build_opener(_HTTPOnlyRedirectHandler)
+
+
+def check_image_source(source):
+    """Source autorisée : URL http(s), ou fichier sous IMPORT_IMAGE_FOLDER / IMAGE_RAW_FOLDER.
+
+    Retourne la source (chemin absolu pour un fichier) ; lève ValueError sinon.
+    """
+    scheme = urlparse(source).scheme
+    if scheme in ('http', 'https'):
+        return source
+    if scheme or '://' in source:
+        raise ValueError(f"Source d'image non autorisée : {source}")
+
+    # realpath : ni '..' ni lien symbolique pour sortir des dossiers autorisés
+    path = os.path.realpath(source)
+    for folder in (app.config['IMPORT_IMAGE_FOLDER'], app.config['IMAGE_RAW_FOLDER']):
+        root = os.path.realpath(folder)
+        if os.path.commonpath([path, root]) == root:
+            return path
+    raise ValueError(f"Fichier image hors du dossier d'import : {source}")
+
+
+def _open_source(source):
+    """Fichier local ou URL http(s), au plus IMAGE_SOURCE_MAX_BYTES ; retourne un objet fichier binaire"""
+    source = check_image_source(source)
+    max_bytes = app.config['IMAGE_SOURCE_MAX_BYTES']
+    if urlparse(source).scheme in ('http', 'https'):
+        with _url_opener.open(source, timeout=30) as response:
+            length = response.headers.get('Content-Length')
+            if length and length.isdigit() and int(length) > max_bytes:
+                raise ValueError(f"Image trop volumineuse ({length} octets)")
+            data = response.read(max_bytes + 1)
+        if len(data) > max_bytes:
+            raise ValueError(f"Image trop volumineuse (plus de {max_bytes} octets)")
+        return io.BytesIO(data)
+
+    if os.path.getsize(source) > max_bytes:
+        raise ValueError(f"Image trop volumineuse ({os.path.getsize(source)} octets)")
+    return open(source, 'rb')
+
+
+def _is_raw_upload(source):
+    raw_folder = os.path.abspath(app.config['IMAGE_RAW_FOLDER'])
+    return os.path.dirname(os.path.abspath(source)) == raw_folder
+
+
+def discard_raw_uploads(sources):
+    """Supprime les fichiers bruts envoyés (jamais les sources d'import ni les URL)"""
+    for source in sources:
+        if source and _is_raw_upload(source) and os.path.exists(source):
+            os.remove(source)
+
+
+def delete_image_jobs(product_id=None):
+    """Supprime les tâches d'un produit, ou toutes (sans commit).
+
+    Retourne leurs sources : à passer à discard_raw_uploads() après le commit.
+    """
+    query = ImageJob.query
+    if product_id is not None:
+        query = query.filter_by(product_id=product_id)
+    sources = [source for (source,) in query.with_entities(ImageJob.source)]
+    query.delete(synchronize_session=False)
+    return sources
+
+
+def claim_next_job():
+    """Réserve la plus ancienne tâche en attente ; None si la file est vide
+
+    Le passage pending -> processing est un UPDATE conditionnel : plusieurs
+    processus peuvent consommer la même file sans traiter deux fois une tâche.
+    """
+    while True:
+        # Une tâche en échec n'est retentée qu'après IMAGE_WORKER_INTERVAL secondes
+        retry_before = datetime.utcnow() - timedelta(seconds=app.config['IMAGE_WORKER_INTERVAL'])
+        job_id = db.session.query(ImageJob.id).filter(
+            ImageJob.status == 'pending',
+            or_(ImageJob.attempts == 0, ImageJob.updated_at < retry_before)
+        ).order_by(ImageJob.created_at, ImageJob.id).limit(1).scalar()
+        if job_id is None:
+            return None
+
+        claimed = db.session.execute(
+            update(ImageJob)
+            .where(ImageJob.id == job_id, ImageJob.status == 'pending')
+            .values(status='processing', attempts=ImageJob.attempts + 1, updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+        if claimed:
+            return db.session.get(ImageJob, job_id)
+
+
+def run_job(job):
+    """Traite une tâche réservée et enregistre son résultat ; retourne True si l'image est prête"""
+    if db.session.get(Product, job.product_id) is None:
+        # Produit supprimé pendant l'attente : tâche abandonnée avec son fichier brut
+        source = job.source
+        db.session.delete(job)
+        db.session.commit()
+        discard_raw_uploads([source])
+        return False
+
+    try:
+        with _open_source(job.source) as source:
+            data = source.read()
+        filename = save_product_image(io.BytesIO(data))
+    except Exception as e:
+        # Nouvel essai au prochain passage tant que le maximum n'est pas atteint
+        job.status = 'pending' if job.attempts < app.config['IMAGE_JOB_MAX_ATTEMPTS'] else 'failed'
+        job.error = str(e)
+        db.session.commit()
+        if job.status == 'failed':
+            discard_raw_uploads([job.source])
+        return False
+
+    product = db.session.get(Product, job.product_id)
+    previous = product.image_filename if product is not None else None
+    if product is not None:
+        product.image_filename = filename
+    job.status = 'done'
+    job.error = None
+    db.session.commit()
+
+    # Image existante réutilisée : une suppression concurrente a pu passer avant le commit
+    if product is not None:
+        restore_released_image(filename, data)
+
+    # Fichiers partagés entre produits identiques : supprimés seulement sans référence
+    if previous != filename:
+        release_product_image(previous)
+    if product is None:
+        release_product_image(filename)
+
+    discard_raw_uploads([job.source])
+    return True
+
+
+def requeue_stale_jobs(max_age=timedelta(minutes=10)):
+    """Remet en attente les tâches restées 'processing' (processus arrêté en cours de traitement)"""
+    requeued = ImageJob.query.filter(
+        ImageJob.status == 'processing',
+        ImageJob.updated_at < datetime.utcnow() - max_age
+    ).update({'status': 'pending'}, synchronize_session=False)
+    db.session.commit()
+    return requeued
+
+
+def process_pending_images(limit=None):
+    """Traite les tâches en attente, les plus anciennes d'abord ; retourne (réussies, échouées)"""
+    done = failed = 0
+    while limit is None or done + failed < limit:
+        job = claim_next_job()
+        if job is None:
+            break
+        if run_job(job):
+            done += 1
+        else:
+            failed += 1
+    return done, failed
+
+
+def start_worker(interval=None):
+    """Démarre le traitement des images dans un thread (un par processus)"""
+    global _worker
+    if _worker is not None:
+        return _worker
+
+    interval = interval or app.config['IMAGE_WORKER_INTERVAL']
+    stop = threading.Event()
+
+    def run():
+        with app.app_context():
+            requeue_stale_jobs()
+        while not stop.is_set():
+            try:
+                with app.app_context():
+                    process_pending_images()
+            except Exception as e:
+                app.logger.warning(f"Traitement des images impossible : {e}")
+            _wakeup.wait(interval)
+            _wakeup.clear()
+
+    _worker = threading.Thread(target=run, name='image-worker', daemon=True)
+    _worker.stop = stop
+    _worker.start()
+    return _worker
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Worker de traitement des images produits")
+    parser.add_argument('--once', action='store_true', help="traiter la file puis s'arrêter")
+    args = parser.parse_args()
+
+    create_app()
+    with app.app_context():
+        requeued = requeue_stale_jobs()
+        if requeued:
+            print(f"🔁 {requeued} tâches interrompues remises en attente")
+
+        while True:
+            done, failed = process_pending_images()
+            if done or failed:
+                print(f"🖼️  Images traitées : {done} réussies, {failed} en échec")
+            if args.once:
+                break
+            time.sleep(app.config['IMAGE_WORKER_INTERVAL'])
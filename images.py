@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Images produits : redimensionnement et dérivés multi-tailles WebP / JPEG
+
+Chaque image produit est enregistrée en version 500px (Product.image_filename,
+utilisée en repli) et déclinée en IMAGE_WIDTHS largeurs, en WebP et en JPEG.
+Une image plus étroite n'est pas agrandie : seules les largeurs inférieures à
+la sienne sont produites, plus un dérivé à sa largeur réelle ; le nom de chaque
+dérivé porte sa largeur réelle, reprise telle quelle dans le srcset.
+Les templates l'affichent avec la macro product_img (macros/images.html), qui
+produit un <picture> avec srcset / sizes et loading="lazy".
+
+Les fichiers sont nommés d'après l'empreinte SHA-256 du fichier envoyé : deux
+envois identiques partagent les mêmes fichiers, un nom ne désigne jamais deux
+contenus différents et les URL peuvent être mises en cache sans revalidation.
+Un fichier n'est supprimé que lorsqu'aucun produit ne le référence plus ; la
+vérification et la suppression se font sous un verrou de fichier partagé par
+tous les processus, que le worker reprend après avoir enregistré une référence
+vers une image réutilisée pour la recréer si elle vient d'être supprimée.
+"""
+
+import fcntl
+import glob
+import hashlib
+import io
+import os
+import re
+from contextlib import contextmanager
+from flask import request, url_for
+from sqlalchemy import select
+from app import app, create_app, db
+
+IMAGE_MAX_SIZE = (500, 500)
+IMAGE_WIDTHS = (100, 300, 500)
+DERIVATIVE_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+
+# Largeurs des dérivés présents sur disque, par image, () si aucun (un nom désigne toujours
+# le même contenu ; après generate_missing_derivatives, redémarrer les autres workers)
+_derivative_widths = {}
+
+# Noms adressés par le contenu : empreinte, largeur éventuelle, extension
+HASHED_NAME = re.compile(r'^[0-9a-f]{32}(_\d+w)?\.[a-z]+$')
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+def image_path(filename):
+    return os.path.join(app.config['UPLOAD_FOLDER'], filename)
+
+
+def derivative_name(filename, width, ext):
+    """photo.png, 300, 'webp' -> photo_300w.webp"""
+    return f"{os.path.splitext(filename)[0]}_{width}w.{ext}"
+
+
+def _save(image, filename, fmt, **options):
+    """Écriture atomique : un fichier présent sur disque est toujours complet"""
+    path = image_path(filename)
+    tmp = f"{path}.{os.getpid()}.tmp"  # deux workers peuvent écrire la même image (même contenu)
+    image.save(tmp, fmt, **options)
+    os.replace(tmp, path)
+
+
+def derivative_widths_for(source_width):
+    """Largeurs IMAGE_WIDTHS plus étroites que la source, plus celle de la source (jamais agrandie)"""
+    width = min(source_width, IMAGE_WIDTHS[-1])
+    return tuple(w for w in IMAGE_WIDTHS if w < width) + (width,)
+
+
+def write_derivatives(image, filename):
+    """Enregistre les dérivés WebP et JPEG à côté de l'image principale"""
+    from PIL import Image  # Pillow n'est chargé que par le worker d'images
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if image.mode in ('LA', 'PA') or 'transparency' in image.info else 'RGB')
+
+    widths = derivative_widths_for(image.width)
+    for width in widths:
+        resized = image
+        if image.width > width:
+            resized = image.resize((width, round(image.height * width / image.width)), Image.Resampling.LANCZOS)
+        for ext, (fmt, options) in DERIVATIVE_FORMATS.items():
+            # Le JPEG n'a pas de transparence : fond blanc
+            out = resized
+            if fmt == 'JPEG' and resized.mode == 'RGBA':
+                out = Image.new('RGB', resized.size, 'white')
+                out.paste(resized, mask=resized.getchannel('A'))
+            _save(out, derivative_name(filename, width, ext), fmt, **options)
+    _derivative_widths[filename] = widths
+
+
+def save_product_image(fileobj):
+    """Redimensionne l'image, l'enregistre avec ses dérivés ; retourne le nom du fichier
+
+    Si une image identique existe déjà, elle est réutilisée sans être retraitée.
+    """
+    from PIL import Image
+
+    data = fileobj.read()
+    digest = hashlib.sha256(data).hexdigest()[:32]
+    image = Image.open(io.BytesIO(data))
+    fmt = {'MPO': 'JPEG'}.get(image.format, image.format) or 'PNG'
+    filename = f"{digest}.{'jpg' if fmt == 'JPEG' else fmt.lower()}"
+
+    if os.path.exists(image_path(filename)) and has_derivatives(filename):
+        return filename
+
+    image.thumbnail(IMAGE_MAX_SIZE, Image.Resampling.LANCZOS)
+    write_derivatives(image, filename)
+    _save(image, filename, fmt)
+    return filename
+
+
+def remove_product_image(filename):
+    """Supprime l'image principale et ses dérivés du disque"""
+    stem = glob.escape(image_path(os.path.splitext(filename)[0]))
+    paths = [image_path(filename)] + [path for ext in DERIVATIVE_FORMATS for path in glob.glob(f"{stem}_*w.{ext}")]
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+    _derivative_widths.pop(filename, None)
+
+
+@contextmanager
+def image_files_lock():
+    """Verrou exclusif entre processus (et threads) : suppression / réutilisation d'images"""
+    os.makedirs(app.instance_path, exist_ok=True)
+    with open(os.path.join(app.instance_path, 'images.lock'), 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+
+def _is_referenced(filename):
+    """Lecture dans une transaction neuve : voit les références validées par les autres processus"""
+    from models import Product
+
+    with db.engine.connect() as connection:
+        return connection.execute(
+            select(Product.id).where(Product.image_filename == filename).limit(1)
+        ).first() is not None
+
+
+def release_product_image(filename):
+    """Supprime les fichiers d'une image qui n'est plus référencée par aucun produit
+
+    À appeler après la modification ou la suppression du produit en base ;
+    retourne True si les fichiers ont été supprimés.
+    """
+    if not filename:
+        return False
+    with image_files_lock():
+        if _is_referenced(filename) or not os.path.exists(image_path(filename)):
+            return False
+        remove_product_image(filename)
+    return True
+
+
+def restore_released_image(filename, data):
+    """Après le commit d'une référence vers une image réutilisée : la recrée si
+    release_product_image() l'a supprimée entre la réutilisation et le commit"""
+    with image_files_lock():
+        if os.path.exists(image_path(filename)):
+            return False
+        _derivative_widths.pop(filename, None)
+        save_product_image(io.BytesIO(data))
+    return True
+
+
+def derivative_widths(filename):
+    """Largeurs réelles des dérivés sur disque, () s'il n'y en a pas (repli sur le fichier unique)"""
+    widths = _derivative_widths.get(filename)
+    if widths is not None:
+        return widths
+    # Cas courant (source d'au moins 500px) : un seul stat ; sinon largeurs lues dans les noms
+    if os.path.exists(image_path(derivative_name(filename, IMAGE_WIDTHS[-1], 'jpg'))):
+        widths = IMAGE_WIDTHS
+    else:
+        stem = os.path.splitext(filename)[0]
+        names = glob.glob(glob.escape(image_path(stem)) + '_*w.jpg')
+        widths = tuple(sorted(int(os.path.basename(name)[len(stem) + 1:-len('w.jpg')]) for name in names))
+    # () aussi : une image sans dérivés n'en gagne qu'avec write_derivatives(), qui remplace l'entrée
+    _derivative_widths[filename] = widths
+    return widths
+
+
+def has_derivatives(filename):
+    """Vrai si les dérivés existent (images antérieures : repli sur le fichier unique)"""
+    return bool(derivative_widths(filename))
+
+
+@app.template_global()
+def image_url(filename):
+    return url_for('static', filename='images/products/' + filename)
+
+
+@app.template_global()
+def image_srcset(filename, ext):
+    """Attribut srcset des dérivés d'une image, vide si elle n'en a pas"""
+    widths = derivative_widths(filename) if filename else ()
+    return ', '.join(f"{image_url(derivative_name(filename, width, ext))} {width}w" for width in widths)
+
+
+@app.after_request
+def cache_immutable_images(response):
+    """Images adressées par le contenu : cache d'un an, sans revalidation"""
+    if (request.endpoint == 'static' and response.status_code == 200
+            and request.view_args.get('filename', '').startswith('images/products/')
+            and HASHED_NAME.match(os.path.basename(request.view_args['filename']))):
+        response.cache_control.public = True
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+        response.cache_control.no_cache = None
+    return response
+
+
+def generate_missing_derivatives():
+    """Crée les dérivés manquants, et refait ceux d'anciennes images étroites nommés
+    d'après une largeur qu'ils n'ont pas (ex. _500w pour une source de 300px)"""
+    from PIL import Image
+    from models import Product
+
+    created = 0
+    filenames = [name for (name,) in Product.query.with_entities(Product.image_filename).filter(
+        Product.image_filename.isnot(None)).distinct()]
+    for filename in filenames:
+        if not os.path.exists(image_path(filename)):
+            continue
+        with Image.open(image_path(filename)) as image:
+            if derivative_widths(filename) == derivative_widths_for(image.width):
+                continue
+            image.load()
+            _derivative_widths.pop(filename, None)
+            for path in glob.glob(glob.escape(image_path(os.path.splitext(filename)[0])) + '_*w.*'):
+                os.remove(path)
+            write_derivatives(image, filename)
+        created += 1
+    return created
+
+
+if __name__ == '__main__':
+    create_app()
+    with app.app_context():
+        created = generate_missing_derivatives()
+    print(f"✅ Dérivés générés pour {created} images")
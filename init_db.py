@@ -3,9 +3,10 @@
 Script d'initialisation de la base de données avec des données de test
 """
 
-from app import app, db
+from app import app, create_app, db
 from models import User, Product, Category, Order, OrderItem
 from werkzeug.security import generate_password_hash
+from search import init_search_index
 from datetime import datetime
 
 def init_database():
@@ -15,6 +16,7 @@ def init_database():
         # Supprimer toutes les tables existantes et les recréer
         db.drop_all()
         db.create_all()
+        init_search_index()
         
         print("Base de données initialisée...")
         
@@ -304,4 +306,5 @@ def init_database():
         print("\nVous pouvez maintenant lancer l'application avec: python app.py")
 
 if __name__ == '__main__':
+    create_app()
     init_database()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Test de charge des profils gunicorn (sync, gthread, gevent)
+
+Démarre gunicorn avec chaque profil demandé, envoie pendant DURATION secondes
+des requêtes concurrentes sur un mélange de pages du catalogue, puis affiche
+le débit et les latences p50 / p99. Une requête lente (SLOW_URL) peut être
+mêlée au trafic pour mesurer son effet sur les autres visiteurs.
+
+    python loadtest.py --profiles sync,gthread,gevent --clients 20 --duration 20
+"""
+
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+# Connexions directes, sans les proxys HTTP de l'environnement
+opener = urllib.request.build_opener(urllib.request.ProxyHandler({}))
+
+URLS = ['/', '/products', '/products?page=2', '/products?search=parfum', '/product/1', '/product/2']
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(base_url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            opener.open(base_url + '/', timeout=2).read()
+            return True
+        except (urllib.error.URLError, ConnectionError, OSError):
+            time.sleep(0.2)
+    return False
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def run_load(base_url, clients, duration, urls, slow_url=None):
+    """Chaque client enchaîne les requêtes ; retourne (latences en s, erreurs, durée réelle)"""
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def client(index):
+        i = index
+        while time.monotonic() < stop_at:
+            # Le premier client envoie la requête lente en boucle, les autres le trafic normal
+            url = slow_url if slow_url and index == 0 else urls[i % len(urls)]
+            i += 1
+            start = time.monotonic()
+            try:
+                opener.open(base_url + url, timeout=30).read()
+            except (urllib.error.URLError, ConnectionError, OSError):
+                with lock:
+                    errors[0] += 1
+                continue
+            if not (slow_url and index == 0):
+                with lock:
+                    latencies.append(time.monotonic() - start)
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors[0], time.monotonic() - started
+
+
+def bench_profile(profile, args):
+    port = free_port()
+    env = dict(os.environ, SERVER_PROFILE=profile, PORT=str(port), WEB_CONCURRENCY=str(args.workers))
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py', 'wsgi:app'],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        if not wait_ready(base_url):
+            print(f"❌ {profile} : gunicorn n'a pas démarré")
+            return None
+        run_load(base_url, args.clients, 2, URLS)  # préchauffage
+        latencies, errors, elapsed = run_load(base_url, args.clients, args.duration, URLS, args.slow_url)
+    finally:
+        server.terminate()
+        server.wait()
+
+    return {
+        'profile': profile,
+        'requests': len(latencies),
+        'rps': len(latencies) / elapsed,
+        'p50': percentile(latencies, 50) * 1000,
+        'p99': percentile(latencies, 99) * 1000,
+        'errors': errors,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--profiles', default='sync,gthread,gevent')
+    parser.add_argument('--clients', type=int, default=20)
+    parser.add_argument('--duration', type=int, default=20)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--slow-url', default=None, help="URL lente envoyée en boucle par un client")
+    args = parser.parse_args()
+
+    print(f"🚀 {args.clients} clients, {args.duration} s, {args.workers} worker(s) par profil")
+    results = [bench_profile(profile, args) for profile in args.profiles.split(',')]
+
+    print(f"\n{'Profil':<10}{'Requêtes':>10}{'Req/s':>10}{'p50 (ms)':>10}{'p99 (ms)':>10}{'Erreurs':>9}")
+    for result in filter(None, results):
+        print(f"{result['profile']:<10}{result['requests']:>10}{result['rps']:>10.1f}"
+              f"{result['p50']:>10.1f}{result['p99']:>10.1f}{result['errors']:>9}")
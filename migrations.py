@@ -0,0 +1,107 @@
+"""
+Migrations de schéma versionnées pour les bases existantes
+
+db.create_all() crée les tables manquantes mais ne modifie pas les tables
+existantes : chaque évolution de colonne ou d'index est ajoutée ici avec un
+numéro de version. Les migrations doivent être idempotentes, car une base
+neuve créée par create_all() possède déjà le schéma final.
+"""
+
+from sqlalchemy import inspect, text
+from app import db
+
+MIGRATIONS = []
+
+
+def migration(version, description):
+    """Enregistre une migration dans l'ordre des versions"""
+    def register(func):
+        MIGRATIONS.append((version, description, func))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return func
+    return register
+
+
+def _columns(connection, table):
+    return {column['name'] for column in inspect(connection).get_columns(table)}
+
+
+@migration(1, "Order.idempotency_key : clé unique de soumission du checkout")
+def add_order_idempotency_key(connection):
+    if 'idempotency_key' not in _columns(connection, 'order'):
+        connection.execute(text('ALTER TABLE "order" ADD COLUMN idempotency_key VARCHAR(64)'))
+    connection.execute(text(
+        'CREATE UNIQUE INDEX IF NOT EXISTS ix_order_idempotency_key ON "order" (idempotency_key)'
+    ))
+
+
+def _create_indexes(connection, names):
+    """Crée les index déclarés dans models.py (par nom) s'ils n'existent pas encore"""
+    declared = {index.name: index for table in db.metadata.sorted_tables for index in table.indexes}
+    for name in names:
+        declared[name].create(connection, checkfirst=True)
+
+
+@migration(2, "Index simples et composites sur les colonnes filtrées et triées")
+def add_query_indexes(connection):
+    _create_indexes(connection, [
+        'ix_user_created_at_id',
+        'ix_product_active_category_price',
+        'ix_product_created_at_id',
+        'ix_order_user_created_at',
+        'ix_order_status_created_at',
+        'ix_order_created_at_id',
+        'ix_order_item_order_id',
+        'ix_order_item_product_id',
+    ])
+
+
+@migration(3, "Product.sku et index de rapprochement pour les imports en masse")
+def add_product_sku(connection):
+    if 'sku' not in _columns(connection, 'product'):
+        connection.execute(text('ALTER TABLE product ADD COLUMN sku VARCHAR(64)'))
+    _create_indexes(connection, ['ix_product_sku', 'ix_product_name_brand_volume'])
+
+
+@migration(4, "Product.updated_at et Category.updated_at : dates de modification (ETag / Last-Modified)")
+def add_updated_at(connection):
+    if 'updated_at' not in _columns(connection, 'product'):
+        connection.execute(text('ALTER TABLE product ADD COLUMN updated_at TIMESTAMP'))
+        connection.execute(text('UPDATE product SET updated_at = COALESCE(created_at, CURRENT_TIMESTAMP)'))
+    if 'updated_at' not in _columns(connection, 'category'):
+        connection.execute(text('ALTER TABLE category ADD COLUMN updated_at TIMESTAMP'))
+        connection.execute(text('UPDATE category SET updated_at = CURRENT_TIMESTAMP'))
+
+
+def current_version(connection):
+    connection.execute(text("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)"))
+    return connection.execute(text("SELECT max(version) FROM schema_version")).scalar() or 0
+
+
+def run_migrations():
+    """Applique les migrations dont la version est supérieure à celle de la base"""
+    applied = []
+    with db.engine.begin() as connection:
+        version = current_version(connection)
+        for number, description, func in MIGRATIONS:
+            if number <= version:
+                continue
+            func(connection)
+            connection.execute(text("INSERT INTO schema_version (version) VALUES (:v)"), {'v': number})
+            applied.append((number, description))
+    return applied
+
+
+if __name__ == '__main__':
+    from app import app, create_app
+
+    create_app()
+    with app.app_context():
+        db.create_all()
+        applied = run_migrations()
+
+    if applied:
+        for number, description in applied:
+            print(f"✅ Migration {number} appliquée : {description}")
+    else:
+        print("✅ Base de données à jour")
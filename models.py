@@ -1,22 +1,30 @@
 from app import db
 from flask_login import UserMixin
 from datetime import datetime
+from sqlalchemy import select, func
+from sqlalchemy.orm import column_property
 
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
     password_hash = db.Column(db.String(120), nullable=False)
-    is_admin = db.Column(db.Boolean, default=False)
+    # active_history : l'ancienne valeur est chargée pour les compteurs du dashboard (stats.py)
+    is_admin = column_property(db.Column(db.Boolean, default=False), active_history=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relations
     orders = db.relationship('Order', backref='user', lazy=True)
 
+    __table_args__ = (
+        db.Index('ix_user_created_at_id', 'created_at', 'id'),
+    )
+
 class Category(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relations
     products = db.relationship('Product', backref='category', lazy=True)
@@ -34,25 +42,107 @@ class Product(db.Model):
     category_id = db.Column(db.Integer, db.ForeignKey('category.id'))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     is_active = db.Column(db.Boolean, default=True)
+    sku = db.Column(db.String(64), unique=True, index=True)  # Référence fournisseur (imports)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # ETag / Last-Modified
     
     # Relations
     order_items = db.relationship('OrderItem', backref='product', lazy=True)
 
+    __table_args__ = (
+        # Catalogue filtré (actif, catégorie, prix) et produits similaires
+        db.Index('ix_product_active_category_price', 'is_active', 'category_id', 'price'),
+        # Tri / pagination par curseur du catalogue et de l'admin
+        db.Index('ix_product_created_at_id', 'created_at', 'id'),
+        # Rapprochement des imports sans référence fournisseur
+        db.Index('ix_product_name_brand_volume', 'name', 'brand', 'volume'),
+    )
+
 class Order(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     total_amount = db.Column(db.Float, nullable=False)
-    status = db.Column(db.String(20), default='pending')  # pending, confirmed, shipped, delivered, cancelled
+    status = column_property(db.Column(db.String(20), default='pending'), active_history=True)  # pending, confirmed, shipped, delivered, cancelled
     shipping_address = db.Column(db.Text)
     phone = db.Column(db.String(20))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    idempotency_key = db.Column(db.String(64), unique=True, index=True)  # Jeton du formulaire de checkout
     
     # Relations
     items = db.relationship('OrderItem', backref='order', lazy=True, cascade='all, delete-orphan')
 
+    __table_args__ = (
+        # Historique d'un client, le plus récent d'abord
+        db.Index('ix_order_user_created_at', 'user_id', 'created_at'),
+        # Liste admin filtrée par statut et commandes en attente du dashboard
+        db.Index('ix_order_status_created_at', 'status', 'created_at'),
+        # Liste admin sans filtre, commandes récentes
+        db.Index('ix_order_created_at_id', 'created_at', 'id'),
+    )
+
 class OrderItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False)
-    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
+    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False, index=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False, index=True)
     quantity = db.Column(db.Integer, nullable=False)
     price = db.Column(db.Float, nullable=False)  # Prix au moment de la commande
+
+class CartItem(db.Model):
+    """Ligne du panier stockée côté serveur (un panier par utilisateur)"""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), primary_key=True)
+    quantity = db.Column(db.Integer, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class SiteStats(db.Model):
+    """Compteurs du dashboard maintenus à chaque écriture (une seule ligne, id = 1)"""
+    id = db.Column(db.Integer, primary_key=True)
+    total_products = db.Column(db.Integer, nullable=False, default=0)
+    total_orders = db.Column(db.Integer, nullable=False, default=0)
+    total_users = db.Column(db.Integer, nullable=False, default=0)
+    pending_orders = db.Column(db.Integer, nullable=False, default=0)
+    admin_users = db.Column(db.Integer, nullable=False, default=0)
+    users_with_orders = db.Column(db.Integer, nullable=False, default=0)
+    reconciled_at = db.Column(db.DateTime)
+
+class CatalogVersion(db.Model):
+    """Version du catalogue (une seule ligne, id = 1), incrémentée à chaque modification
+    de produit ou de catégorie : elle fait partie des clés du cache de pages"""
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+class ImageJob(db.Model):
+    """Traitement d'image produit en attente (file de tâches stockée en base)"""
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
+    source = db.Column(db.String(500), nullable=False)  # chemin local ou URL http(s)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, processing, done, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_image_job_status_created_at', 'status', 'created_at'),
+    )
+
+class StockReservation(db.Model):
+    """Stock retenu pour le panier d'un utilisateur jusqu'à expiration"""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'product_id', name='uq_reservation_user_product'),
+        db.Index('ix_reservation_product_expires', 'product_id', 'expires_at'),
+    )
+
+# Nombre d'articles calculé en SQL (sous-requête corrélée), chargé à la demande avec undefer()
+Order.items_count = column_property(
+    select(func.count(OrderItem.id))
+    .where(OrderItem.order_id == Order.id)
+    .correlate_except(OrderItem)
+    .scalar_subquery(),
+    deferred=True
+)
@@ -0,0 +1,226 @@
+"""
+Cache des pages publiques du catalogue et de fragments de templates
+
+Les pages index, products et product_detail sont identiques pour tous les
+visiteurs anonymes d'une même langue : la réponse est mise en cache, clé =
+route + paramètres + langue + version du catalogue. Toute modification d'un
+produit ou d'une catégorie incrémente la version (CatalogVersion), ce qui
+rend les anciennes entrées inaccessibles dans tous les processus à la fois.
+Le stock affiché peut avoir au plus PAGE_CACHE_TTL secondes de retard.
+"""
+
+import pickle
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import Counter, OrderedDict
+from functools import wraps
+from flask import request, session, make_response
+from flask_login import current_user
+from markupsafe import Markup
+from sqlalchemy import event, update
+from app import app, db, request_locale
+from models import Product, Category, CatalogVersion
+
+CATALOG_VERSION_ID = 1
+
+_counters = Counter()
+_counters_lock = threading.Lock()
+
+
+def _count(name, amount=1):
+    with _counters_lock:
+        _counters[name] += amount
+
+
+class PageCacheBackend(ABC):
+    """Interface commune : valeurs picklables avec durée de vie"""
+
+    @abstractmethod
+    def get(self, key):
+        """Valeur en cache, ou None si absente ou expirée"""
+
+    @abstractmethod
+    def set(self, key, value, ttl):
+        """Enregistre la valeur pour ttl secondes"""
+
+    def size(self):
+        return None
+
+
+class MemoryPageCache(PageCacheBackend):
+    """LRU par processus avec expiration"""
+
+    def __init__(self):
+        self.max_size = app.config['PAGE_CACHE_SIZE']
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def size(self):
+        with self._lock:
+            return len(self._entries)
+
+
+class RedisPageCache(PageCacheBackend):
+    """Cache partagé entre processus et serveurs (module redis requis)"""
+
+    def __init__(self):
+        import redis
+        self.client = redis.Redis.from_url(app.config['PAGE_CACHE_REDIS_URL'])
+
+    def _key(self, key):
+        return 'velours:page:' + repr(key)
+
+    def get(self, key):
+        data = self.client.get(self._key(key))
+        return pickle.loads(data) if data is not None else None
+
+    def set(self, key, value, ttl):
+        self.client.setex(self._key(key), ttl, pickle.dumps(value))
+
+
+PAGE_CACHE_BACKENDS = {
+    'memory': MemoryPageCache,
+    'redis': RedisPageCache,
+}
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_page_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = PAGE_CACHE_BACKENDS[app.config['PAGE_CACHE_BACKEND']]()
+    return _cache
+
+
+def catalog_version():
+    return db.session.query(CatalogVersion.version).filter_by(id=CATALOG_VERSION_ID).scalar() or 0
+
+
+def _bump_catalog_version(connection):
+    result = connection.execute(
+        update(CatalogVersion).where(CatalogVersion.id == CATALOG_VERSION_ID)
+        .values(version=CatalogVersion.version + 1)
+    )
+    if result.rowcount == 0:
+        connection.execute(CatalogVersion.__table__.insert().values(id=CATALOG_VERSION_ID, version=1))
+    _count('invalidations')
+
+
+@event.listens_for(db.session, 'after_flush')
+def track_catalog_changes(session, flush_context):
+    """Produit ou catégorie créé, modifié ou supprimé : nouvelle version, dans la même transaction"""
+    for obj in session.new | session.deleted:
+        if isinstance(obj, (Product, Category)):
+            return _bump_catalog_version(session.connection())
+    for obj in session.dirty:
+        if isinstance(obj, (Product, Category)) and session.is_modified(obj, include_collections=False):
+            return _bump_catalog_version(session.connection())
+
+
+def invalidate_catalog():
+    """Pour les écritures en masse (UPDATE / DELETE directs) qui échappent au suivi du flush"""
+    _bump_catalog_version(db.session.connection())
+    db.session.commit()
+
+
+def _cacheable():
+    return (request.method == 'GET'
+            and app.config['PAGE_CACHE_TTL'] > 0
+            and not current_user.is_authenticated
+            and '_flashes' not in session)
+
+
+def _request_key(kind, *parts):
+    args = tuple(sorted(request.args.items(multi=True)))
+    return (kind, catalog_version(), request_locale(), request.endpoint, args) + parts
+
+
+def cached_page(view):
+    """Met en cache la réponse complète d'une vue pour les visiteurs anonymes"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not _cacheable():
+            return view(*args, **kwargs)
+
+        cache = get_page_cache()
+        key = _request_key('page', tuple(sorted(kwargs.items())))
+        entry = cache.get(key)
+        if entry is not None:
+            _count('hits')
+            body, status, headers = entry
+            response = make_response(body, status, headers)
+            response.headers['X-Page-Cache'] = 'HIT'
+            # ETag / Last-Modified enregistrés avec la page : 304 si le navigateur l'a déjà
+            return response.make_conditional(request)
+
+        _count('misses')
+        response = make_response(view(*args, **kwargs))
+        if response.status_code == 200 and not response.is_streamed:
+            headers = [(k, v) for k, v in response.headers if k.lower() != 'set-cookie']
+            cache.set(key, (response.get_data(), response.status_code, headers), app.config['PAGE_CACHE_TTL'])
+            _count('stores')
+        response.headers['X-Page-Cache'] = 'MISS'
+        return response
+    return wrapper
+
+
+@app.template_global()
+def cache_fragment(name, *vary, caller):
+    """{% call cache_fragment('nom', variante...) %}...{% endcall %} : rendu mis en cache"""
+    if app.config['PAGE_CACHE_TTL'] <= 0:
+        return caller()
+
+    cache = get_page_cache()
+    key = ('fragment', catalog_version(), request_locale(), name) + vary
+    html = cache.get(key)
+    if html is not None:
+        _count('fragment_hits')
+        return Markup(html)
+
+    _count('fragment_misses')
+    html = str(caller())
+    cache.set(key, html, app.config['PAGE_CACHE_TTL'])
+    return Markup(html)
+
+
+def page_cache_stats():
+    """Compteurs de succès / échecs depuis le démarrage du processus"""
+    with _counters_lock:
+        counters = dict(_counters)
+    lookups = counters.get('hits', 0) + counters.get('misses', 0)
+    return {
+        'backend': app.config['PAGE_CACHE_BACKEND'],
+        'ttl': app.config['PAGE_CACHE_TTL'],
+        'entries': get_page_cache().size(),
+        'catalog_version': catalog_version(),
+        'hits': counters.get('hits', 0),
+        'misses': counters.get('misses', 0),
+        'stores': counters.get('stores', 0),
+        'hit_ratio': round(counters.get('hits', 0) / lookups, 3) if lookups else None,
+        'fragment_hits': counters.get('fragment_hits', 0),
+        'fragment_misses': counters.get('fragment_misses', 0),
+        'invalidations': counters.get('invalidations', 0),
+    }
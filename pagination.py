@@ -0,0 +1,154 @@
+"""
+Pagination par curseur (keyset / seek) pour les listes du catalogue et de l'admin
+"""
+
+import base64
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from sqlalchemy import and_, or_, DateTime
+from flask import request
+from app import app
+
+# Cache LRU des totaux : {clé: (expiration, total)}, au plus KEYSET_COUNT_CACHE_SIZE entrées
+_count_cache = OrderedDict()
+_count_cache_lock = threading.Lock()
+
+
+def encode_cursor(values, direction):
+    """Encode les valeurs de tri d'une ligne en curseur opaque pour l'URL"""
+    payload = [direction] + [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, columns):
+    """Décode un curseur ; retourne (direction, valeurs) ou None s'il est invalide"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        direction, *values = json.loads(raw)
+        if direction not in ('next', 'prev') or len(values) != len(columns):
+            return None
+        values = [
+            datetime.fromisoformat(v) if isinstance(column.type, DateTime) else v
+            for column, v in zip(columns, values)
+        ]
+        return direction, values
+    except (ValueError, TypeError):
+        return None
+
+
+def cached_count(key, query, ttl=None):
+    """COUNT(*) mis en cache quelques secondes pour éviter un comptage par page"""
+    ttl = app.config['KEYSET_COUNT_TTL'] if ttl is None else ttl
+    now = time.monotonic()
+    with _count_cache_lock:
+        entry = _count_cache.get(key)
+        if entry and entry[0] > now:
+            _count_cache.move_to_end(key)
+            return entry[1]
+
+    total = query.order_by(None).count()
+
+    with _count_cache_lock:
+        _count_cache[key] = (now + ttl, total)
+        _count_cache.move_to_end(key)
+        while len(_count_cache) > app.config['KEYSET_COUNT_CACHE_SIZE']:
+            _count_cache.popitem(last=False)
+    return total
+
+
+def _seek_condition(columns, values, descending, forward):
+    """(c1, c2) < (v1, v2) écrit sans row values pour rester portable"""
+    before = descending == forward
+    clauses = []
+    for i, column in enumerate(columns):
+        equals = [columns[j] == values[j] for j in range(i)]
+        compare = column < values[i] if before else column > values[i]
+        clauses.append(and_(*equals, compare))
+    return or_(*clauses)
+
+
+class KeysetPagination:
+    """Page obtenue par recherche de clé, sans OFFSET"""
+
+    is_keyset = True
+
+    def __init__(self, items, per_page, total, next_cursor, prev_cursor):
+        self.items = items
+        self.per_page = per_page
+        self.total = total
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+
+def keyset_paginate(query, columns, cursor=None, per_page=10, descending=True, count_key=None):
+    """Pagine une requête sur des colonnes de tri uniques (ex. created_at, id)"""
+    decoded = decode_cursor(cursor, columns) if cursor else None
+    forward = decoded is None or decoded[0] == 'next'
+
+    # Le total porte sur l'ensemble filtré, pas sur la portion après le curseur
+    total = cached_count(count_key, query) if count_key else None
+
+    if decoded:
+        query = query.filter(_seek_condition(columns, decoded[1], descending, forward))
+
+    # On parcourt à l'envers pour la page précédente, puis on remet dans l'ordre
+    reverse = descending == forward
+    ordering = [c.desc() if reverse else c.asc() for c in columns]
+    rows = query.order_by(None).order_by(*ordering).limit(per_page + 1).all()
+
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if not forward:
+        rows.reverse()
+
+    def key(row):
+        return [getattr(row, c.key) for c in columns]
+
+    next_cursor = prev_cursor = None
+    if rows:
+        if has_more or not forward:
+            next_cursor = encode_cursor(key(rows[-1]), 'next')
+        if decoded and (forward or has_more):
+            prev_cursor = encode_cursor(key(rows[0]), 'prev')
+
+    return KeysetPagination(rows, per_page, total, next_cursor, prev_cursor)
+
+
+def keyset_enabled():
+    """Mode keyset activé globalement (PAGINATION_MODE) ou via ?cursor="""
+    return app.config['PAGINATION_MODE'] == 'keyset' or 'cursor' in request.args
+
+
+# Paramètres qui changent le total ; les autres (curseur, page, inconnus) ne créent pas d'entrée
+COUNT_FILTER_ARGS = ('category', 'search', 'min_price', 'max_price', 'status', 'filter')
+
+
+def request_count_key():
+    """Clé de cache du total : endpoint + filtres connus"""
+    return (request.endpoint, tuple(request.args.get(name, '') for name in COUNT_FILTER_ARGS))
+
+
+def paginate(query, columns, per_page, descending=True):
+    """Pagination OFFSET classique ou keyset selon la configuration"""
+    if keyset_enabled():
+        return keyset_paginate(query, columns,
+                               cursor=request.args.get('cursor'),
+                               per_page=per_page,
+                               descending=descending,
+                               count_key=request_count_key())
+
+    ordering = [c.desc() if descending else c.asc() for c in columns]
+    page = request.args.get('page', 1, type=int)
+    return query.order_by(*ordering).paginate(page=page, per_page=per_page, error_out=False)
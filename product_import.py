@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Import en masse de produits depuis un flux fournisseur CSV ou JSON
+
+Le fichier est lu au fil de l'eau, les lignes sont validées puis insérées ou
+mises à jour par lots de IMPORT_CHUNK_SIZE (une requête INSERT et une requête
+UPDATE par lot). Un produit existant est reconnu par sa référence (sku), à
+défaut par le triplet nom / marque / volume. Les images sont mises en file
+(ImageJob) et traitées à part.
+"""
+
+import csv
+import json
+import math
+import os
+from datetime import datetime
+from sqlalchemy import insert, update
+from app import app, create_app, db
+from models import Product, Category
+from image_jobs import queue_image, process_pending_images, check_image_source
+from stats import reconcile_stats
+from page_cache import invalidate_catalog
+
+GENDERS = {'homme', 'femme', 'mixte'}
+FALSE_VALUES = {'0', 'false', 'non', 'no', 'n'}
+MAX_REPORTED_ERRORS = 50
+
+
+class ImportReport:
+    """Bilan d'un import : compteurs et premières erreurs par ligne"""
+
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.images_queued = 0
+        self.error_count = 0
+        self.errors = []
+
+    def add_error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f"Ligne {line} : {message}")
+
+
+def iter_csv(stream):
+    """(numéro de ligne, dict) pour chaque ligne d'un CSV à séparateur ';' ou ','"""
+    header = stream.readline().lstrip('\ufeff')
+    delimiter = ';' if header.count(';') >= header.count(',') else ','
+    fields = [name.strip().lower() for name in next(csv.reader([header], delimiter=delimiter))]
+    for line, row in enumerate(csv.DictReader(stream, fieldnames=fields, delimiter=delimiter), start=2):
+        yield line, row
+
+
+def iter_json(stream, read_size=1 << 16):
+    """(position, dict) pour chaque objet d'un tableau JSON ou d'un fichier JSON Lines"""
+    decoder = json.JSONDecoder()
+    buffer = stream.read(read_size).lstrip('\ufeff')
+    pos = 0
+    in_array = None
+    index = 0
+
+    while True:
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+            pos += 1
+        if pos == len(buffer):
+            more = stream.read(read_size)
+            if not more:
+                return
+            buffer, pos = buffer[pos:] + more, 0
+            continue
+
+        if in_array is None:
+            in_array = buffer[pos] == '['
+            if in_array:
+                pos += 1
+                continue
+        if in_array and buffer[pos] == ']':
+            return
+
+        try:
+            obj, pos = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            # Objet coupé en fin de tampon : on lit la suite et on réessaie
+            more = stream.read(read_size)
+            if not more:
+                raise
+            buffer, pos = buffer[pos:] + more, 0
+            continue
+
+        index += 1
+        yield index, obj
+        if pos > read_size:
+            buffer, pos = buffer[pos:], 0
+
+
+def _text(row, key):
+    value = row.get(key)
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def parse_row(row, categories, create_categories=True):
+    """Valide une ligne ; retourne les colonnes Product présentes ou lève ValueError"""
+    if not isinstance(row, dict):
+        raise ValueError("objet attendu")
+
+    data = {'name': _text(row, 'name')}
+    if not data['name']:
+        raise ValueError("nom manquant")
+
+    price = _text(row, 'price')
+    try:
+        data['price'] = float(price.replace(',', '.'))
+    except (AttributeError, ValueError):
+        raise ValueError(f"prix invalide ({price})")
+    # float() accepte aussi « inf » et « nan »
+    if not math.isfinite(data['price']):
+        raise ValueError(f"prix invalide ({price})")
+    if data['price'] < 0:
+        raise ValueError("prix négatif")
+
+    stock = _text(row, 'stock')
+    if stock is not None:
+        try:
+            value = float(stock)
+        except ValueError:
+            raise ValueError(f"stock invalide ({stock})")
+        # int(float('inf')) lèverait OverflowError
+        if not math.isfinite(value):
+            raise ValueError(f"stock invalide ({stock})")
+        data['stock'] = int(value)
+        if data['stock'] < 0:
+            raise ValueError("stock négatif")
+
+    for field in ('sku', 'description', 'brand', 'volume'):
+        value = _text(row, field)
+        if value is not None:
+            data[field] = value
+
+    gender = _text(row, 'gender')
+    if gender is not None:
+        gender = gender.lower()
+        if gender not in GENDERS:
+            raise ValueError(f"genre inconnu ({gender})")
+        data['gender'] = gender
+
+    active = _text(row, 'is_active')
+    if active is not None:
+        data['is_active'] = active.lower() not in FALSE_VALUES
+
+    category = _text(row, 'category')
+    if category is not None:
+        category_id = categories.get(category.lower())
+        if category_id is None:
+            if not create_categories:
+                raise ValueError(f"catégorie inconnue ({category})")
+            category_id = db.session.execute(
+                insert(Category).values(name=category).returning(Category.id)
+            ).scalar_one()
+            categories[category.lower()] = category_id
+        data['category_id'] = category_id
+
+    return data
+
+
+def _match_key(data):
+    return (data['name'], data.get('brand'), data.get('volume'))
+
+
+def _find_existing(rows):
+    """Produits existants du lot, en deux requêtes ; ({sku: (id, image)}, {clé: (id, image)})"""
+    skus = {data['sku'] for data, _ in rows if data.get('sku')}
+    names = {data['name'] for data, _ in rows if not data.get('sku')}
+    by_sku, by_key = {}, {}
+
+    if skus:
+        for product_id, sku, image in db.session.query(
+                Product.id, Product.sku, Product.image_filename).filter(Product.sku.in_(skus)):
+            by_sku[sku] = (product_id, image)
+    if names:
+        for product_id, name, brand, volume, image in db.session.query(
+                Product.id, Product.name, Product.brand, Product.volume,
+                Product.image_filename).filter(Product.name.in_(names)):
+            by_key.setdefault((name, brand, volume), (product_id, image))
+    return by_sku, by_key
+
+
+def _flush_chunk(chunk, report):
+    """Insère / met à jour un lot de lignes validées puis met en file leurs images"""
+    # Une même référence présente deux fois dans le lot : la dernière ligne l'emporte
+    unique = {}
+    for data, image in chunk:
+        unique[('sku', data['sku']) if data.get('sku') else _match_key(data)] = (data, image)
+    rows = list(unique.values())
+
+    by_sku, by_key = _find_existing(rows)
+    now = datetime.utcnow()
+    inserts, insert_images, updates, images = [], [], [], []
+
+    for data, image in rows:
+        existing = by_sku.get(data['sku']) if data.get('sku') else by_key.get(_match_key(data))
+        if existing is None:
+            inserts.append(dict({
+                'sku': None, 'description': '', 'brand': None, 'volume': None, 'gender': None,
+                'category_id': None, 'stock': 0, 'is_active': True,
+            }, **data))
+            insert_images.append(image)
+        else:
+            product_id, current_image = existing
+            updates.append(dict(data, id=product_id, updated_at=now))
+            # Les images déjà traitées ne sont pas retéléchargées à chaque import
+            if image and not current_image:
+                images.append((product_id, image))
+
+    if inserts:
+        ids = db.session.scalars(
+            insert(Product).returning(Product.id, sort_by_parameter_order=True), inserts
+        ).all()
+        images.extend((product_id, image) for product_id, image in zip(ids, insert_images) if image)
+    if updates:
+        db.session.execute(update(Product), updates)
+
+    for product_id, image in images:
+        queue_image(product_id, image)
+    db.session.commit()
+
+    report.created += len(inserts)
+    report.updated += len(updates)
+    report.images_queued += len(images)
+
+
+def import_rows(rows, create_categories=True, image_root=None, chunk_size=None):
+    """Importe des lignes (numéro, dict) par lots ; retourne un ImportReport"""
+    chunk_size = chunk_size or app.config['IMPORT_CHUNK_SIZE']
+    report = ImportReport()
+    categories = {name.lower(): category_id for category_id, name in db.session.query(Category.id, Category.name)}
+    chunk = []
+
+    for line, row in rows:
+        try:
+            data = parse_row(row, categories, create_categories)
+        except ValueError as e:
+            report.add_error(line, str(e))
+            continue
+
+        image = _text(row, 'image')
+        if image:
+            # Chemin relatif : sous le dossier d'import ; fichiers hors de ce dossier et URL non http(s) refusés
+            if '://' not in image and not os.path.isabs(image):
+                image = os.path.join(image_root or app.config['IMPORT_IMAGE_FOLDER'], image)
+            try:
+                image = check_image_source(image)
+            except ValueError as e:
+                report.add_error(line, str(e))
+                continue
+        chunk.append((data, image))
+
+        if len(chunk) >= chunk_size:
+            _flush_chunk(chunk, report)
+            chunk = []
+
+    if chunk:
+        _flush_chunk(chunk, report)
+    db.session.commit()
+
+    # Les INSERT / UPDATE en masse ne passent pas par le suivi des compteurs ni du cache des pages
+    if report.created or report.updated:
+        invalidate_catalog()
+    if report.created:
+        reconcile_stats()
+    return report
+
+
+def import_products(stream, fmt, **options):
+    """Importe un flux texte au format 'csv', 'json' ou 'jsonl'"""
+    rows = iter_csv(stream) if fmt == 'csv' else iter_json(stream)
+    return import_rows(rows, **options)
+
+
+def detect_format(filename):
+    extension = os.path.splitext(filename or '')[1].lower().lstrip('.')
+    return extension if extension in ('csv', 'json', 'jsonl') else None
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Import en masse de produits (CSV / JSON)")
+    parser.add_argument('path', help="fichier CSV, JSON ou JSON Lines")
+    parser.add_argument('--format', choices=('csv', 'json', 'jsonl'), help="déduit de l'extension par défaut")
+    parser.add_argument('--no-create-categories', action='store_true',
+                        help="rejeter les lignes dont la catégorie n'existe pas")
+    parser.add_argument('--chunk-size', type=int, help="lignes par lot (IMPORT_CHUNK_SIZE par défaut)")
+    parser.add_argument('--image-root', help="dossier des images aux chemins relatifs "
+                                             "(IMPORT_IMAGE_FOLDER par défaut, et doit s'y trouver)")
+    parser.add_argument('--process-images', action='store_true',
+                        help="traiter les images en file à la fin de l'import")
+    args = parser.parse_args()
+
+    fmt = args.format or detect_format(args.path)
+    if fmt is None:
+        parser.error("format inconnu, utilisez --format")
+
+    create_app()
+    start = time.perf_counter()
+    with app.app_context(), open(args.path, encoding='utf-8-sig', newline='') as stream:
+        report = import_products(stream, fmt,
+                                 create_categories=not args.no_create_categories,
+                                 image_root=args.image_root,
+                                 chunk_size=args.chunk_size)
+        elapsed = time.perf_counter() - start
+
+        print(f"✅ {report.created} produits créés, {report.updated} mis à jour en {elapsed:.1f}s")
+        print(f"🖼️  {report.images_queued} images en file de traitement")
+        if report.error_count:
+            print(f"⚠️  {report.error_count} lignes rejetées :")
+            for error in report.errors:
+                print(f"   - {error}")
+
+        if args.process_images and report.images_queued:
+            done, failed = process_pending_images()
+            print(f"🖼️  Images traitées : {done} réussies, {failed} en échec")
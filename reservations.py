@@ -0,0 +1,137 @@
+"""
+Réservations de stock temporaires pour les paniers (ventes flash)
+"""
+
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import exists, func, insert, literal, select, update
+from sqlalchemy.orm import aliased
+from app import app, db
+from models import Product, StockReservation
+
+_sweeper = None
+
+
+def _now():
+    return datetime.utcnow()
+
+
+def reservation_ttl():
+    return timedelta(minutes=app.config['RESERVATION_TTL_MINUTES'])
+
+
+def reserved_subquery(product_id_column, exclude_user_id=None):
+    """Quantité réservée (non expirée) par les autres utilisateurs, corrélée au produit"""
+    query = db.session.query(func.coalesce(func.sum(StockReservation.quantity), 0)).filter(
+        StockReservation.product_id == product_id_column,
+        StockReservation.expires_at > _now()
+    )
+    if exclude_user_id is not None:
+        query = query.filter(StockReservation.user_id != exclude_user_id)
+    return query.scalar_subquery()
+
+
+def reserved_quantities(product_ids, exclude_user_id=None):
+    """Quantités réservées par produit en une requête groupée ; {product_id: quantité}"""
+    product_ids = list(product_ids)
+    if not product_ids:
+        return {}
+
+    query = db.session.query(StockReservation.product_id, func.sum(StockReservation.quantity)).filter(
+        StockReservation.product_id.in_(product_ids),
+        StockReservation.expires_at > _now()
+    )
+    if exclude_user_id is not None:
+        query = query.filter(StockReservation.user_id != exclude_user_id)
+    return dict(query.group_by(StockReservation.product_id).all())
+
+
+def available_stock(product, user_id=None):
+    """Stock réellement disponible : stock moins les réservations des autres"""
+    reserved = reserved_quantities([product.id], exclude_user_id=user_id).get(product.id, 0)
+    return max(product.stock - reserved, 0)
+
+
+def reserve(user_id, product_id, quantity):
+    """Fixe (ou prolonge) la réservation de l'utilisateur si le stock le permet (sans commit).
+
+    Retourne False si le stock disponible est insuffisant au moment de l'écriture.
+    """
+    product_id = int(product_id)
+    mine = (StockReservation.user_id == user_id, StockReservation.product_id == product_id)
+    with db.session.no_autoflush:
+        # Réservations simultanées du même produit traitées l'une après l'autre (PostgreSQL ;
+        # SQLite n'a qu'un écrivain à la fois)
+        db.session.query(Product.id).filter(Product.id == product_id).with_for_update().first()
+        # Lue avant la première écriture : une seule requête d'écriture sous le verrou SQLite
+        existing = db.session.query(StockReservation.id).filter(*mine).first() is not None
+
+    # Vérification et écriture dans la même requête, comme decrement_stock()
+    others = aliased(StockReservation)
+    reserved = (select(func.coalesce(func.sum(others.quantity), 0))
+                .where(others.product_id == product_id, others.user_id != user_id, others.expires_at > _now())
+                .scalar_subquery())
+    stock = select(Product.stock).where(Product.id == product_id).scalar_subquery()
+    enough = stock - reserved >= quantity
+    expires_at = _now() + reservation_ttl()
+
+    if not existing:
+        # INSERT ... SELECT soumis aux mêmes conditions ; 0 ligne si le stock manque
+        # ou si une réservation concurrente vient d'être créée (mise à jour ci-dessous)
+        result = db.session.execute(
+            insert(StockReservation).from_select(
+                ['user_id', 'product_id', 'quantity', 'expires_at'],
+                select(literal(user_id), literal(product_id), literal(quantity),
+                       literal(expires_at, StockReservation.expires_at.type)).where(enough, ~exists().where(*mine))
+            )
+        )
+        if result.rowcount:
+            return True
+
+    result = db.session.execute(
+        update(StockReservation)
+        .where(*mine, enough)
+        .values(quantity=quantity, expires_at=expires_at)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def release(user_id, product_id=None):
+    """Libère une réservation, ou toutes celles de l'utilisateur (sans commit)"""
+    query = StockReservation.query.filter_by(user_id=user_id)
+    if product_id is not None:
+        query = query.filter_by(product_id=int(product_id))
+    query.delete(synchronize_session=False)
+
+
+def sweep_expired():
+    """Supprime les réservations expirées ; retourne le nombre de lignes supprimées"""
+    with app.app_context():
+        deleted = StockReservation.query.filter(
+            StockReservation.expires_at <= _now()
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        return deleted
+
+
+def start_sweeper(interval=None):
+    """Démarre le nettoyage périodique dans un thread (un par processus)"""
+    global _sweeper
+    if _sweeper is not None:
+        return _sweeper
+
+    interval = interval or app.config['RESERVATION_SWEEP_INTERVAL']
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval):
+            try:
+                sweep_expired()
+            except Exception as e:
+                app.logger.warning(f"Nettoyage des réservations impossible : {e}")
+
+    _sweeper = threading.Thread(target=run, name='reservation-sweeper', daemon=True)
+    _sweeper.stop = stop
+    _sweeper.start()
+    return _sweeper
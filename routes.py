@@ -1,13 +1,31 @@
-from flask import render_template, request, redirect, url_for, flash, session, jsonify
+from flask import render_template, request, redirect, url_for, flash, session, jsonify, Response, stream_with_context, abort
 from flask_login import login_user, login_required, logout_user, current_user
 from flask_babel import _, get_locale
 from werkzeug.security import generate_password_hash, check_password_hash
-from werkzeug.utils import secure_filename
 from app import app, db
-from models import User, Product, Order, OrderItem, Category
-import os
-from PIL import Image
+from models import User, Product, Order, OrderItem, Category, StockReservation, CartItem
+from search import search_products
+from pagination import paginate
+from cart_service import price_cart, decrement_stock
+from reservations import available_stock, reserved_quantities, reserve, release
+from cart_store import get_cart, get_cart_store, cart_item_count
+from stats import get_site_stats, reconcile_stats
+from exports import EXPORTS, stream_export
+from product_import import import_products, detect_format
+from image_jobs import (store_raw_upload, queue_image, wake_worker, pending_image_products,
+                        delete_image_jobs, discard_raw_uploads)
+from images import release_product_image
+from page_cache import cached_page, invalidate_catalog, page_cache_stats
+from conditional import PageValidators
+from sqlite_mode import retry_on_lock
+from db_routing import read_replica
+from user_cache import invalidate_user
+import io
+import secrets
 from datetime import datetime
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload, selectinload, undefer
 
 # Route pour changer de langue
 @app.route('/set_language/<language>')
@@ -18,12 +36,16 @@ def set_language(language=None):
 
 # Routes principales
 @app.route('/')
+@read_replica
+@cached_page
 def index():
     featured_products = Product.query.filter_by(is_active=True).limit(8).all()
     categories = Category.query.all()
     return render_template('index.html', products=featured_products, categories=categories)
 
 @app.route('/products')
+@read_replica
+@cached_page
 def products():
     page = request.args.get('page', 1, type=int)
     search = request.args.get('search', '')
@@ -34,10 +56,11 @@ def products():
     query = Product.query.filter_by(is_active=True)
     
     if search:
-        query = query.filter(Product.name.contains(search) | Product.description.contains(search))
+        # Recherche plein texte classée par pertinence (FTS5 / tsvector)
+        query = search_products(query, search)
     
     if category_id:
-        query = query.filter_by(category_id=category_id)
+        query = query.filter(Product.category_id == category_id)
     
     if min_price:
         query = query.filter(Product.price >= min_price)
@@ -45,23 +68,53 @@ def products():
     if max_price:
         query = query.filter(Product.price <= max_price)
     
-    products = query.paginate(page=page, per_page=12, error_out=False)
+    # Page inchangée depuis la dernière visite : 304 avant la pagination et le rendu
+    product_state = query.with_entities(func.max(Product.updated_at), func.count(Product.id)).order_by(None).one()
+    category_state = db.session.query(func.max(Category.updated_at), func.count(Category.id)).one()
+    validators = PageValidators(product_state[1], category_state[1],
+                                last_modified=max(filter(None, (product_state[0], category_state[0])), default=None))
+    if validators.is_fresh():
+        return validators.not_modified()
+
+    if search:
+        # Les résultats classés par pertinence restent paginés par numéro de page
+        products = query.paginate(page=page, per_page=12, error_out=False)
+    else:
+        products = paginate(query, (Product.created_at, Product.id), per_page=12, descending=False)
     categories = Category.query.all()
     
-    return render_template('products.html', products=products, categories=categories,
+    return validators.respond(render_template('products.html', products=products, categories=categories,
                          search=search, selected_category=category_id,
-                         min_price=min_price, max_price=max_price)
+                         min_price=min_price, max_price=max_price))
 
 @app.route('/product/<int:id>')
+@read_replica
+@cached_page
 def product_detail(id):
     product = Product.query.get_or_404(id)
+    # Stock disponible = stock moins les quantités retenues dans les paniers des autres
+    available = available_stock(product, current_user.id if current_user.is_authenticated else None)
+
+    # Version de la page : le produit, sa catégorie et les produits actifs de la catégorie
+    related_state = db.session.query(func.max(Product.updated_at), func.count(Product.id)).filter(
+        Product.category_id == product.category_id,
+        Product.is_active == True
+    ).one()
+    category_updated = product.category.updated_at if product.category else None
+    validators = PageValidators(product.id, product.stock, available, related_state[1],
+                                last_modified=max(filter(None, (product.updated_at, related_state[0], category_updated)),
+                                                  default=None))
+    if validators.is_fresh():
+        return validators.not_modified()
+
     related_products = Product.query.filter(
         Product.category_id == product.category_id,
         Product.id != product.id,
         Product.is_active == True
     ).limit(4).all()
     
-    return render_template('product_detail.html', product=product, related_products=related_products)
+    return validators.respond(render_template('product_detail.html', product=product, related_products=related_products,
+                         available_stock=available, reserved_stock=product.stock - available))
 
 # Authentification
 @app.route('/login', methods=['GET', 'POST'])
@@ -83,6 +136,7 @@ def login():
     return render_template('auth/login.html')
 
 @app.route('/register', methods=['GET', 'POST'])
+@retry_on_lock
 def register():
     if request.method == 'POST':
         username = request.form['username']
@@ -124,25 +178,12 @@ def logout():
 @app.route('/cart')
 @login_required
 def cart():
-    cart_items = session.get('cart', {})
-    products = []
-    total = 0
-    
-    for product_id, quantity in cart_items.items():
-        product = Product.query.get(int(product_id))
-        if product:
-            subtotal = product.price * quantity
-            products.append({
-                'product': product,
-                'quantity': quantity,
-                'subtotal': subtotal
-            })
-            total += subtotal
-    
-    return render_template('cart.html', cart_items=products, total=total)
+    priced = price_cart(get_cart(current_user.id))
+    return render_template('cart.html', cart_items=priced.lines, total=priced.total)
 
 @app.route('/add-to-cart', methods=['POST'])
 @login_required
+@retry_on_lock
 def add_to_cart():
     data = request.get_json()
     product_id = str(data.get('product_id'))
@@ -152,149 +193,172 @@ def add_to_cart():
     if not product or not product.is_active:
         return jsonify({'success': False, 'message': 'Produit non trouvé'})
     
-    if product.stock < quantity:
+    available = available_stock(product, current_user.id)
+    if available < quantity:
         return jsonify({'success': False, 'message': 'Stock insuffisant'})
     
-    cart = session.get('cart', {})
+    store = get_cart_store()
+    in_cart = get_cart(current_user.id).get(product_id, 0) + quantity
     
-    if product_id in cart:
-        cart[product_id] += quantity
-    else:
-        cart[product_id] = quantity
+    # Vérifier le stock total : quantité du panier plafonnée au stock disponible
+    target = min(in_cart, available)
+    
+    # Retenir le stock pendant RESERVATION_TTL_MINUTES ; refusé si un autre panier l'a pris entre-temps
+    if not reserve(current_user.id, product.id, target):
+        db.session.rollback()
+        return jsonify({'success': False, 'message': 'Stock insuffisant'})
+    store.set_quantity(current_user.id, product_id, target)
+    db.session.commit()
     
-    # Vérifier le stock total
-    if cart[product_id] > product.stock:
-        cart[product_id] = product.stock
-        return jsonify({'success': False, 'message': f'Quantité ajustée au stock disponible ({product.stock})'})
+    if in_cart > available:
+        return jsonify({'success': False, 'message': f'Quantité ajustée au stock disponible ({available})'})
     
-    session['cart'] = cart
     return jsonify({'success': True})
 
 @app.route('/cart-count')
 @login_required
 def cart_count():
-    cart = session.get('cart', {})
-    count = sum(cart.values())
-    return jsonify({'count': count})
+    return jsonify({'count': cart_item_count(current_user.id)})
 
 @app.route('/update-cart', methods=['POST'])
 @login_required
+@retry_on_lock
 def update_cart():
     data = request.get_json()
     product_id = str(data.get('product_id'))
     quantity = int(data.get('quantity', 0))
     
-    cart = session.get('cart', {})
+    store = get_cart_store()
+    cart = get_cart(current_user.id)
     
     if quantity <= 0:
         cart.pop(product_id, None)
+        store.remove(current_user.id, product_id)
+        release(current_user.id, product_id)
     else:
-        product = Product.query.get(int(product_id))
-        if product and quantity <= product.stock:
-            cart[product_id] = quantity
-        else:
+        cart[product_id] = quantity
+    
+    # Une seule requête : vérifie la ligne modifiée et recalcule les totaux
+    priced = price_cart(cart)
+    if quantity > 0:
+        line = priced.line(product_id)
+        if not line or quantity > available_stock(line['product'], current_user.id):
             return jsonify({'success': False, 'message': 'Stock insuffisant'})
+        if not reserve(current_user.id, product_id, quantity):
+            db.session.rollback()
+            return jsonify({'success': False, 'message': 'Stock insuffisant'})
+        store.set_quantity(current_user.id, product_id, quantity)
     
-    session['cart'] = cart
-    return jsonify({'success': True})
+    db.session.commit()
+    return jsonify({'success': True, 'total': priced.total, 'count': priced.count})
 
 @app.route('/remove-from-cart', methods=['POST'])
 @login_required
+@retry_on_lock
 def remove_from_cart():
     data = request.get_json()
     product_id = str(data.get('product_id'))
 
-    cart = session.get('cart', {})
-    cart.pop(product_id, None)
-    session['cart'] = cart
+    get_cart_store().remove(current_user.id, product_id)
+    release(current_user.id, product_id)
+    db.session.commit()
 
     return jsonify({'success': True})
 
 @app.route('/checkout', methods=['GET', 'POST'])
 @login_required
+@retry_on_lock
 def checkout():
-    cart = session.get('cart', {})
+    # Soumission déjà traitée (double clic, POST rejoué) : renvoyer la commande existante
+    idempotency_key = request.form.get('idempotency_key') if request.method == 'POST' else None
+    if idempotency_key:
+        existing = Order.query.filter_by(idempotency_key=idempotency_key, user_id=current_user.id).first()
+        if existing:
+            return redirect(url_for('order_confirmation', order_id=existing.id))
+
+    # Lecture sans cache : le panier peut avoir été modifié par un autre worker
+    cart = get_cart(current_user.id, fresh=True)
     if not cart:
         flash('Votre panier est vide', 'warning')
         return redirect(url_for('cart'))
 
+    priced = price_cart(cart)
+
     if request.method == 'POST':
-        # Créer la commande
-        total = 0
-        order_items = []
-
-        for product_id, quantity in cart.items():
-            product = Product.query.get(int(product_id))
-            if product and product.stock >= quantity:
-                subtotal = product.price * quantity
-                total += subtotal
-                order_items.append({
-                    'product': product,
-                    'quantity': quantity,
-                    'price': product.price
-                })
-            else:
-                flash(f'Stock insuffisant pour {product.name}', 'error')
-                return redirect(url_for('cart'))
+        if priced.missing:
+            flash('Certains produits de votre panier ne sont plus disponibles', 'error')
+            return redirect(url_for('cart'))
+
+        out_of_stock = priced.out_of_stock()
+        if out_of_stock:
+            for line in out_of_stock:
+                flash(f'Stock insuffisant pour {line["product"].name}', 'error')
+            return redirect(url_for('cart'))
+
+        # Réserver le stock de toutes les lignes de façon atomique
+        failed = decrement_stock(priced, current_user.id)
+        if failed:
+            for line in failed:
+                flash(f'Stock insuffisant pour {line["name"]} '
+                      f'({line["available"]} disponible(s))', 'error')
+            return redirect(url_for('cart'))
 
         # Créer la commande
         order = Order(
             user_id=current_user.id,
-            total_amount=total,
+            total_amount=priced.total,
             shipping_address=request.form['address'],
-            phone=request.form['phone']
+            phone=request.form['phone'],
+            idempotency_key=idempotency_key
         )
-        db.session.add(order)
-        db.session.flush()  # Pour obtenir l'ID de la commande
-
-        # Ajouter les articles de commande
-        for item in order_items:
-            order_item = OrderItem(
-                order_id=order.id,
-                product_id=item['product'].id,
-                quantity=item['quantity'],
-                price=item['price']
-            )
-            db.session.add(order_item)
-
-            # Mettre à jour le stock
-            item['product'].stock -= item['quantity']
-
-        db.session.commit()
-
-        # Vider le panier
-        session.pop('cart', None)
+        try:
+            # La clé d'idempotence unique est insérée dès ce flush : un doublon concurrent échoue ici
+            db.session.add(order)
+            db.session.flush()  # Pour obtenir l'ID de la commande
+
+            # Ajouter les articles de commande
+            for item in priced.lines:
+                order_item = OrderItem(
+                    order_id=order.id,
+                    product_id=item['product'].id,
+                    quantity=item['quantity'],
+                    price=item['price']
+                )
+                db.session.add(order_item)
+
+            # Le stock est décrémenté : vider le panier et ses réservations dans la même transaction
+            get_cart_store().clear(current_user.id)
+            release(current_user.id)
+            db.session.commit()
+        except IntegrityError:
+            # Soumission concurrente avec la même clé : l'autre requête a créé la commande
+            db.session.rollback()
+            existing = Order.query.filter_by(idempotency_key=idempotency_key, user_id=current_user.id).first()
+            if not existing:
+                raise
+            return redirect(url_for('order_confirmation', order_id=existing.id))
 
         flash('Commande passée avec succès !', 'success')
         return redirect(url_for('order_confirmation', order_id=order.id))
 
-    # Calculer le total pour l'affichage
-    products = []
-    total = 0
-
-    for product_id, quantity in cart.items():
-        product = Product.query.get(int(product_id))
-        if product:
-            subtotal = product.price * quantity
-            products.append({
-                'product': product,
-                'quantity': quantity,
-                'subtotal': subtotal
-            })
-            total += subtotal
+    return render_template('checkout.html', cart_items=priced.lines, total=priced.total,
+                         idempotency_key=secrets.token_urlsafe(32))
 
-    return render_template('checkout.html', cart_items=products, total=total)
+# Chargement groupé des articles et de leurs produits (évite 1 + 2N requêtes)
+ORDER_ITEMS_WITH_PRODUCTS = selectinload(Order.items).joinedload(OrderItem.product)
 
 @app.route('/order-confirmation/<int:order_id>')
 @login_required
 def order_confirmation(order_id):
-    order = Order.query.filter_by(id=order_id, user_id=current_user.id).first_or_404()
+    order = Order.query.options(ORDER_ITEMS_WITH_PRODUCTS).filter_by(
+        id=order_id, user_id=current_user.id).first_or_404()
     return render_template('order_confirmation.html', order=order)
 
 @app.route('/orders')
 @login_required
 def orders():
-    user_orders = Order.query.filter_by(user_id=current_user.id).order_by(Order.created_at.desc()).all()
+    user_orders = Order.query.options(ORDER_ITEMS_WITH_PRODUCTS).filter_by(
+        user_id=current_user.id).order_by(Order.created_at.desc()).all()
     return render_template('orders.html', orders=user_orders)
 
 @app.route('/profile')
@@ -305,39 +369,67 @@ def profile():
 # Routes d'administration
 @app.route('/admin')
 @login_required
+@read_replica
 def admin_dashboard():
     if not current_user.is_admin:
         flash('Accès non autorisé', 'error')
         return redirect(url_for('index'))
 
-    # Statistiques
-    total_products = Product.query.count()
-    total_orders = Order.query.count()
-    total_users = User.query.count()
-    pending_orders = Order.query.filter_by(status='pending').count()
+    # Statistiques (compteurs maintenus à chaque écriture, une seule ligne lue)
+    stats = get_site_stats()
 
-    recent_orders = Order.query.order_by(Order.created_at.desc()).limit(5).all()
+    recent_orders = Order.query.options(joinedload(Order.user)).order_by(Order.created_at.desc()).limit(5).all()
     current_date = datetime.now().strftime('%d/%m/%Y')
 
     return render_template('admin/dashboard.html',
-                         total_products=total_products,
-                         total_orders=total_orders,
-                         total_users=total_users,
-                         pending_orders=pending_orders,
+                         total_products=stats.total_products,
+                         total_orders=stats.total_orders,
+                         total_users=stats.total_users,
+                         pending_orders=stats.pending_orders,
                          recent_orders=recent_orders,
                          current_date=current_date)
 
+@app.route('/admin/export/<kind>.<fmt>')
+@login_required
+@read_replica
+def admin_export(kind, fmt):
+    if not current_user.is_admin:
+        flash('Accès non autorisé', 'error')
+        return redirect(url_for('index'))
+
+    if kind not in EXPORTS or fmt not in ('csv', 'json'):
+        abort(404)
+
+    # Réponse en flux : les lignes sont lues et envoyées par lots, en mémoire constante
+    generator, mimetype = stream_export(kind, fmt)
+    filename = f"velours_{kind}_{datetime.now().strftime('%Y%m%d_%H%M')}.{fmt}"
+    return Response(stream_with_context(generator), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+@app.route('/admin/cache-stats')
+@login_required
+def admin_cache_stats():
+    if not current_user.is_admin:
+        flash('Accès non autorisé', 'error')
+        return redirect(url_for('index'))
+
+    return jsonify(page_cache_stats())
+
 @app.route('/admin/products')
 @login_required
+@read_replica
 def admin_products():
     if not current_user.is_admin:
         flash('Accès non autorisé', 'error')
         return redirect(url_for('index'))
 
-    page = request.args.get('page', 1, type=int)
-    products = Product.query.paginate(page=page, per_page=10, error_out=False)
+    products = paginate(Product.query, (Product.created_at, Product.id), per_page=10, descending=False)
+    product_ids = [product.id for product in products.items]
+    reserved = reserved_quantities(product_ids)
+    pending_images = pending_image_products(product_ids)
 
-    return render_template('admin/products.html', products=products)
+    return render_template('admin/products.html', products=products, reserved=reserved,
+                           pending_images=pending_images)
 
 @app.route('/admin/products/add', methods=['GET', 'POST'])
 @login_required
@@ -347,22 +439,12 @@ def admin_add_product():
         return redirect(url_for('index'))
 
     if request.method == 'POST':
-        # Traitement de l'image
-        image_filename = None
+        # Image enregistrée brute, redimensionnée ensuite par le worker d'images
+        image_source = None
         if 'image' in request.files:
             file = request.files['image']
             if file and file.filename:
-                filename = secure_filename(file.filename)
-                # Ajouter un timestamp pour éviter les conflits
-                import time
-                filename = f"{int(time.time())}_{filename}"
-                file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-
-                # Redimensionner l'image
-                image = Image.open(file)
-                image.thumbnail((500, 500), Image.Resampling.LANCZOS)
-                image.save(file_path)
-                image_filename = filename
+                image_source = store_raw_upload(file)
 
         product = Product(
             name=request.form['name'],
@@ -372,12 +454,16 @@ def admin_add_product():
             brand=request.form['brand'],
             volume=request.form['volume'],
             gender=request.form['gender'],
-            category_id=int(request.form['category_id']) if request.form['category_id'] else None,
-            image_filename=image_filename
+            category_id=int(request.form['category_id']) if request.form['category_id'] else None
         )
 
         db.session.add(product)
+        if image_source:
+            db.session.flush()
+            queue_image(product.id, image_source)
         db.session.commit()
+        if image_source:
+            wake_worker()
 
         flash('Produit ajouté avec succès !', 'success')
         return redirect(url_for('admin_products'))
@@ -385,6 +471,37 @@ def admin_add_product():
     categories = Category.query.all()
     return render_template('admin/add_product.html', categories=categories)
 
+@app.route('/admin/products/import', methods=['GET', 'POST'])
+@login_required
+def admin_import_products():
+    if not current_user.is_admin:
+        flash('Accès non autorisé', 'error')
+        return redirect(url_for('index'))
+
+    if request.method == 'POST':
+        file = request.files.get('file')
+        fmt = request.form.get('format') or detect_format(file.filename if file else None)
+        if not file or not file.filename or fmt is None:
+            flash('Veuillez choisir un fichier CSV ou JSON', 'error')
+            return redirect(url_for('admin_import_products'))
+
+        stream = io.TextIOWrapper(file.stream, encoding='utf-8-sig', newline='')
+        try:
+            report = import_products(stream, fmt,
+                                     create_categories=bool(request.form.get('create_categories')))
+        except (UnicodeDecodeError, ValueError) as e:
+            db.session.rollback()
+            flash(f'Fichier illisible : {e}', 'error')
+            return redirect(url_for('admin_import_products'))
+
+        flash(f'Import terminé : {report.created} produits créés, {report.updated} mis à jour, '
+              f'{report.images_queued} images en file de traitement.', 'success')
+        if report.error_count:
+            flash(f'{report.error_count} lignes rejetées : ' + ' ; '.join(report.errors[:10]), 'warning')
+        return redirect(url_for('admin_products'))
+
+    return render_template('admin/import_products.html')
+
 @app.route('/admin/products/edit/<int:id>', methods=['GET', 'POST'])
 @login_required
 def admin_edit_product(id):
@@ -395,25 +512,13 @@ def admin_edit_product(id):
     product = Product.query.get_or_404(id)
 
     if request.method == 'POST':
-        # Traitement de l'image
+        # Nouvelle image : l'ancienne reste affichée jusqu'à la fin du traitement
+        image_source = None
         if 'image' in request.files:
             file = request.files['image']
             if file and file.filename:
-                # Supprimer l'ancienne image
-                if product.image_filename:
-                    old_path = os.path.join(app.config['UPLOAD_FOLDER'], product.image_filename)
-                    if os.path.exists(old_path):
-                        os.remove(old_path)
-
-                filename = secure_filename(file.filename)
-                import time
-                filename = f"{int(time.time())}_{filename}"
-                file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-
-                image = Image.open(file)
-                image.thumbnail((500, 500), Image.Resampling.LANCZOS)
-                image.save(file_path)
-                product.image_filename = filename
+                image_source = store_raw_upload(file)
+                queue_image(product.id, image_source)
 
         product.name = request.form['name']
         product.description = request.form['description']
@@ -426,6 +531,8 @@ def admin_edit_product(id):
         product.is_active = 'is_active' in request.form
 
         db.session.commit()
+        if image_source:
+            wake_worker()
 
         flash('Produit modifié avec succès !', 'success')
         return redirect(url_for('admin_products'))
@@ -448,15 +555,16 @@ def admin_delete_product(id):
         flash(f'Impossible de supprimer ce produit car il est référencé dans {order_items_count} commande(s). Vous pouvez le désactiver à la place.', 'error')
         return redirect(url_for('admin_products'))
 
-    # Supprimer l'image
-    if product.image_filename:
-        image_path = os.path.join(app.config['UPLOAD_FOLDER'], product.image_filename)
-        if os.path.exists(image_path):
-            os.remove(image_path)
-
     try:
+        image_filename = product.image_filename
+        StockReservation.query.filter_by(product_id=product.id).delete()
+        CartItem.query.filter_by(product_id=product.id).delete()
+        image_sources = delete_image_jobs(product.id)
         db.session.delete(product)
         db.session.commit()
+        # Supprimer l'image et ses dérivés si aucun autre produit ne les utilise
+        release_product_image(image_filename)
+        discard_raw_uploads(image_sources)
         flash('Produit supprimé avec succès !', 'success')
     except Exception as e:
         db.session.rollback()
@@ -500,8 +608,8 @@ def admin_delete_all_products():
             return redirect(url_for('admin_products'))
 
         # 2. Récupérer les noms des images avant suppression
-        products_with_images = Product.query.filter(Product.image_filename.isnot(None)).all()
-        image_files = [product.image_filename for product in products_with_images]
+        image_files = [filename for (filename,) in db.session.query(Product.image_filename).filter(
+            Product.image_filename.isnot(None)).distinct()]
 
         # 3. Supprimer tous les OrderItems (pour éviter les contraintes de clé étrangère)
         deleted_order_items = OrderItem.query.count()
@@ -511,24 +619,28 @@ def admin_delete_all_products():
         deleted_orders = Order.query.count()
         Order.query.delete()
 
-        # 5. Supprimer tous les produits
+        # 5. Supprimer tous les produits (et les réservations de panier associées)
+        StockReservation.query.delete()
+        CartItem.query.delete()
+        image_sources = delete_image_jobs()
         Product.query.delete()
 
-        # 6. Supprimer les images des produits
+        # 6. Sauvegarder les changements (suppressions en masse : cache des pages à invalider)
+        invalidate_catalog()
+
+        # 7. Supprimer les images des produits, une fois plus aucune référence en base
         deleted_images = 0
-        images_path = os.path.join(app.static_folder, 'images', 'products')
-        if os.path.exists(images_path):
-            for image_filename in image_files:
-                image_path = os.path.join(images_path, image_filename)
-                if os.path.exists(image_path):
-                    try:
-                        os.remove(image_path)
-                        deleted_images += 1
-                    except Exception as e:
-                        print(f"Erreur lors de la suppression de l'image {image_filename}: {e}")
-
-        # 7. Sauvegarder les changements
-        db.session.commit()
+        for image_filename in image_files:
+            try:
+                if release_product_image(image_filename):
+                    deleted_images += 1
+            except Exception as e:
+                print(f"Erreur lors de la suppression de l'image {image_filename}: {e}")
+        # Fichiers bruts des images encore en attente de traitement
+        discard_raw_uploads(image_sources)
+
+        # Les suppressions en masse échappent au suivi incrémental des compteurs
+        reconcile_stats()
 
         # 8. Message de confirmation
         flash(f'✅ Suppression terminée avec succès ! {total_products} produits, {deleted_orders} commandes, {deleted_order_items} articles de commande et {deleted_images} images supprimés.', 'success')
@@ -541,34 +653,36 @@ def admin_delete_all_products():
 
 @app.route('/admin/orders')
 @login_required
+@read_replica
 def admin_orders():
     if not current_user.is_admin:
         flash('Accès non autorisé', 'error')
         return redirect(url_for('index'))
 
-    page = request.args.get('page', 1, type=int)
     status_filter = request.args.get('status', '')
 
-    query = Order.query
+    query = Order.query.options(joinedload(Order.user), undefer(Order.items_count))
     if status_filter:
         query = query.filter_by(status=status_filter)
 
-    orders = query.order_by(Order.created_at.desc()).paginate(page=page, per_page=10, error_out=False)
+    orders = paginate(query, (Order.created_at, Order.id), per_page=10)
 
     return render_template('admin/orders.html', orders=orders, status_filter=status_filter)
 
 @app.route('/admin/orders/<int:id>')
 @login_required
+@read_replica
 def admin_order_detail(id):
     if not current_user.is_admin:
         flash('Accès non autorisé', 'error')
         return redirect(url_for('index'))
 
-    order = Order.query.get_or_404(id)
+    order = Order.query.options(joinedload(Order.user), ORDER_ITEMS_WITH_PRODUCTS).filter_by(id=id).first_or_404()
     return render_template('admin/order_detail.html', order=order)
 
 @app.route('/admin/orders/<int:id>/update-status', methods=['POST'])
 @login_required
+@retry_on_lock
 def admin_update_order_status(id):
     if not current_user.is_admin:
         flash('Accès non autorisé', 'error')
@@ -588,6 +702,7 @@ def admin_update_order_status(id):
 
 @app.route('/admin/categories')
 @login_required
+@read_replica
 def admin_categories():
     if not current_user.is_admin:
         flash('Accès non autorisé', 'error')
@@ -658,14 +773,33 @@ def admin_delete_category(id):
     return redirect(url_for('admin_categories'))
 
 # Routes de gestion des utilisateurs
+EMPTY_ORDER_STATS = {'count': 0, 'total_spent': 0, 'last_order_at': None}
+
+def get_order_stats(user_ids):
+    """Nombre de commandes, total dépensé et dernière commande par utilisateur, en une requête"""
+    if not user_ids:
+        return {}
+
+    rows = db.session.query(
+        Order.user_id,
+        func.count(Order.id),
+        func.coalesce(func.sum(Order.total_amount), 0),
+        func.max(Order.created_at)
+    ).filter(Order.user_id.in_(user_ids)).group_by(Order.user_id).all()
+
+    return {
+        user_id: {'count': count, 'total_spent': total_spent, 'last_order_at': last_order_at}
+        for user_id, count, total_spent, last_order_at in rows
+    }
+
 @app.route('/admin/users')
 @login_required
+@read_replica
 def admin_users():
     if not current_user.is_admin:
         flash('Accès non autorisé', 'error')
         return redirect(url_for('index'))
 
-    page = request.args.get('page', 1, type=int)
     filter_type = request.args.get('filter', '')
 
     query = User.query
@@ -675,11 +809,11 @@ def admin_users():
     elif filter_type == 'regular':
         query = query.filter_by(is_admin=False)
 
-    users = query.order_by(User.created_at.desc()).paginate(page=page, per_page=10, error_out=False)
+    users = paginate(query, (User.created_at, User.id), per_page=10)
+    order_stats = get_order_stats([user.id for user in users.items])
 
     # Statistiques
-    admin_count = User.query.filter_by(is_admin=True).count()
-    users_with_orders = User.query.join(Order).distinct().count()
+    stats = get_site_stats()
 
     # Utilisateurs récents (7 derniers jours)
     from datetime import datetime, timedelta
@@ -688,12 +822,15 @@ def admin_users():
 
     return render_template('admin/users.html',
                          users=users,
-                         admin_count=admin_count,
-                         users_with_orders=users_with_orders,
+                         order_stats=order_stats,
+                         empty_order_stats=EMPTY_ORDER_STATS,
+                         admin_count=stats.admin_users,
+                         users_with_orders=stats.users_with_orders,
                          recent_users=recent_users)
 
 @app.route('/admin/users/<int:id>')
 @login_required
+@read_replica
 def admin_user_detail(id):
     if not current_user.is_admin:
         flash('Accès non autorisé', 'error')
@@ -726,6 +863,7 @@ def admin_toggle_user_admin(id):
     try:
         user.is_admin = not user.is_admin
         db.session.commit()
+        invalidate_user(user.id)
 
         action = 'promu administrateur' if user.is_admin else 'retiré des administrateurs'
         flash(f'L\'utilisateur {user.username} a été {action} avec succès !', 'success')
@@ -765,13 +903,17 @@ def admin_delete_user(id):
         # 2. Supprimer toutes les commandes de cet utilisateur
         Order.query.filter_by(user_id=user.id).delete()
 
-        # 3. Supprimer l'utilisateur
+        # 3. Supprimer l'utilisateur et ses réservations de panier
+        StockReservation.query.filter_by(user_id=user.id).delete()
+        CartItem.query.filter_by(user_id=user.id).delete()
         username = user.username
         email = user.email
         db.session.delete(user)
 
         # 4. Sauvegarder les changements
         db.session.commit()
+        invalidate_user(id)
+        reconcile_stats()
 
         # 5. Message de confirmation
         if orders_count > 0:
@@ -0,0 +1,228 @@
+"""
+Index de recherche plein texte pour le catalogue de produits
+"""
+
+import re
+import threading
+import unicodedata
+from abc import ABC, abstractmethod
+from sqlalchemy import text, literal_column, func, table, column, select
+from app import app, db
+from models import Product
+
+# Colonnes indexées (ordre = ordre des colonnes de l'index FTS)
+SEARCH_COLUMNS = ('name', 'brand', 'description')
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def normalize_term(value):
+    """Met en minuscules et retire les accents (Élégance -> elegance)"""
+    decomposed = unicodedata.normalize('NFKD', value or '')
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def tokenize(search):
+    """Découpe une saisie utilisateur en mots normalisés"""
+    return _WORD_RE.findall(normalize_term(search))
+
+
+class SearchBackend(ABC):
+    """Interface commune des moteurs de recherche produits"""
+
+    name = None
+
+    def install(self, connection):
+        """Crée les structures d'index si nécessaire"""
+
+    def rebuild(self, connection):
+        """Reconstruit entièrement l'index"""
+
+    @abstractmethod
+    def apply(self, query, search):
+        """Filtre et trie une requête Product selon la recherche"""
+
+
+class LikeSearchBackend(SearchBackend):
+    """Repli sans index : LIKE '%terme%' sur le nom et la description"""
+
+    name = 'like'
+
+    def apply(self, query, search):
+        for token in search.split():
+            query = query.filter(Product.name.contains(token) | Product.description.contains(token))
+        return query
+
+
+class SQLiteFTSSearchBackend(SearchBackend):
+    """Table virtuelle FTS5 synchronisée par triggers avec la table product"""
+
+    name = 'fts5'
+    table = 'product_search'
+
+    def install(self, connection):
+        installed = connection.execute(
+            text("SELECT count(*) FROM sqlite_master WHERE name IN (:table, :trigger)"),
+            {'table': self.table, 'trigger': f'{self.table}_ai'}
+        ).scalar()
+        if installed == 2:
+            return
+
+        # db.drop_all() supprime les triggers avec la table product mais pas l'index
+        connection.execute(text(f"DROP TABLE IF EXISTS {self.table}"))
+
+        columns = ', '.join(SEARCH_COLUMNS)
+        old_values = ', '.join(f'old.{c}' for c in SEARCH_COLUMNS)
+        new_values = ', '.join(f'new.{c}' for c in SEARCH_COLUMNS)
+
+        # Table "external content" : l'index ne duplique pas le texte des produits
+        connection.execute(text(
+            f"CREATE VIRTUAL TABLE {self.table} USING fts5({columns}, "
+            f"content='product', content_rowid='id', "
+            f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        ))
+
+        # Les triggers couvrent aussi les suppressions en masse (Product.query.delete())
+        connection.execute(text(
+            f"CREATE TRIGGER {self.table}_ai AFTER INSERT ON product BEGIN "
+            f"INSERT INTO {self.table}(rowid, {columns}) VALUES (new.id, {new_values}); END"
+        ))
+        connection.execute(text(
+            f"CREATE TRIGGER {self.table}_ad AFTER DELETE ON product BEGIN "
+            f"INSERT INTO {self.table}({self.table}, rowid, {columns}) "
+            f"VALUES ('delete', old.id, {old_values}); END"
+        ))
+        connection.execute(text(
+            f"CREATE TRIGGER {self.table}_au AFTER UPDATE OF {columns} ON product BEGIN "
+            f"INSERT INTO {self.table}({self.table}, rowid, {columns}) "
+            f"VALUES ('delete', old.id, {old_values}); "
+            f"INSERT INTO {self.table}(rowid, {columns}) VALUES (new.id, {new_values}); END"
+        ))
+
+        self.rebuild(connection)
+
+    def rebuild(self, connection):
+        connection.execute(text(f"INSERT INTO {self.table}({self.table}) VALUES ('rebuild')"))
+
+    def match_expression(self, search):
+        """Construit une requête MATCH : chaque mot est cherché en préfixe"""
+        tokens = tokenize(search)
+        return ' '.join(f'"{token}"*' for token in tokens)
+
+    def apply(self, query, search):
+        expression = self.match_expression(search)
+        if not expression:
+            return query
+
+        # CTE matérialisée : l'index est lu une seule fois. Jointure directe, SQLite
+        # peut parcourir product et relancer le MATCH pour chaque ligne (quadratique)
+        index = table(self.table, column('rowid'), column('rank'))
+        matches = (select(index.c.rowid, index.c.rank)
+                   .where(literal_column(self.table).op('MATCH')(expression))
+                   .cte(f'{self.table}_matches')
+                   .prefix_with('MATERIALIZED'))
+        return (query
+                .join(matches, matches.c.rowid == Product.id)
+                .order_by(matches.c.rank))
+
+
+class PostgresSearchBackend(SearchBackend):
+    """Index GIN sur un tsvector calculé, insensible aux accents via unaccent"""
+
+    name = 'postgres'
+    index = 'ix_product_search'
+
+    def _document(self):
+        parts = ' || \' \' || '.join(f"coalesce({c}, '')" for c in SEARCH_COLUMNS)
+        return f"to_tsvector('simple', velours_unaccent({parts}))"
+
+    def install(self, connection):
+        connection.execute(text("CREATE EXTENSION IF NOT EXISTS unaccent"))
+        # unaccent() n'est pas IMMUTABLE : un wrapper est nécessaire pour l'index
+        connection.execute(text(
+            "CREATE OR REPLACE FUNCTION velours_unaccent(text) RETURNS text "
+            "AS $$ SELECT public.unaccent('public.unaccent', $1) $$ "
+            "LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT"
+        ))
+        connection.execute(text(
+            f"CREATE INDEX IF NOT EXISTS {self.index} ON product USING GIN (({self._document()}))"
+        ))
+
+    def rebuild(self, connection):
+        connection.execute(text(f"REINDEX INDEX {self.index}"))
+
+    def apply(self, query, search):
+        tokens = tokenize(search)
+        if not tokens:
+            return query
+
+        # Le document doit être identique à l'expression indexée pour que l'index soit utilisé
+        document = literal_column(self._document())
+        ts_query = func.to_tsquery('simple', ' & '.join(f'{token}:*' for token in tokens))
+        return (query
+                .filter(document.op('@@')(ts_query))
+                .order_by(func.ts_rank(document, ts_query).desc()))
+
+
+SEARCH_BACKENDS = {
+    backend.name: backend
+    for backend in (LikeSearchBackend, SQLiteFTSSearchBackend, PostgresSearchBackend)
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def _sqlite_has_fts5(connection):
+    try:
+        connection.execute(text("CREATE VIRTUAL TABLE temp._fts5_probe USING fts5(x)"))
+        connection.execute(text("DROP TABLE temp._fts5_probe"))
+        return True
+    except Exception:
+        return False
+
+
+def get_search_backend():
+    """Retourne le moteur configuré (SEARCH_BACKEND) ou détecté selon la base"""
+    global _backend
+    if _backend is not None:
+        return _backend
+
+    with _backend_lock:
+        if _backend is not None:
+            return _backend
+
+        name = app.config.get('SEARCH_BACKEND', 'auto')
+        if name == 'auto':
+            dialect = db.engine.dialect.name
+            if dialect == 'postgresql':
+                name = 'postgres'
+            elif dialect == 'sqlite':
+                with db.engine.connect() as connection:
+                    name = 'fts5' if _sqlite_has_fts5(connection) else 'like'
+            else:
+                name = 'like'
+
+        _backend = SEARCH_BACKENDS[name]()
+    return _backend
+
+
+def init_search_index():
+    """Installe l'index de recherche (à appeler après db.create_all())"""
+    backend = get_search_backend()
+    with db.engine.begin() as connection:
+        backend.install(connection)
+
+
+def rebuild_search_index():
+    """Reconstruit l'index (après un import SQL direct par exemple)"""
+    backend = get_search_backend()
+    with db.engine.begin() as connection:
+        backend.rebuild(connection)
+
+
+def search_products(query, search):
+    """Applique la recherche plein texte classée à une requête Product"""
+    if not search or not search.strip():
+        return query
+    return get_search_backend().apply(query, search)
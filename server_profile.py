@@ -0,0 +1,85 @@
+"""
+Profils de concurrence gunicorn et pool de connexions SQLAlchemy associé
+
+SERVER_PROFILE choisit le type de worker :
+- 'sync'    : une requête à la fois par processus (ancien comportement)
+- 'gthread' : WEB_THREADS requêtes en parallèle par processus (par défaut)
+- 'gevent'  : jusqu'à WORKER_CONNECTIONS requêtes par processus (module gevent requis)
+
+Le pool de connexions est dimensionné d'après le nombre de requêtes simultanées
+d'un processus, plus les threads de fond (nettoyage des réservations, images) :
+chaque requête tient au plus une connexion, personne n'attend le pool.
+Avec gevent, le pool est plafonné (DB_POOL_SIZE) : les requêtes en excès
+attendent une connexion au lieu de saturer la base.
+
+Ce module ne doit pas importer app : gunicorn.conf.py le lit avant le chargement.
+"""
+
+import os
+
+SERVER_PROFILES = {
+    'sync': {'worker_class': 'sync', 'threads': 1},
+    'gthread': {'worker_class': 'gthread', 'threads': 4},
+    'gevent': {'worker_class': 'gevent', 'threads': 1},
+}
+
+# Threads démarrés dans chaque worker (post_fork) qui utilisent aussi la base
+BACKGROUND_THREADS = 2
+
+# Plafond du pool avec gevent (des centaines de greenlets pour quelques connexions)
+GEVENT_POOL_SIZE = 10
+
+
+def server_profile():
+    """Nom du profil configuré (SERVER_PROFILE), 'gthread' par défaut"""
+    name = os.environ.get('SERVER_PROFILE', 'gthread')
+    if name not in SERVER_PROFILES:
+        raise ValueError(f"SERVER_PROFILE inconnu : {name} (choix : {', '.join(SERVER_PROFILES)})")
+    return name
+
+
+def worker_class(profile=None):
+    return SERVER_PROFILES[profile or server_profile()]['worker_class']
+
+
+def worker_threads(profile=None):
+    profile = profile or server_profile()
+    if profile != 'gthread':
+        return 1
+    return int(os.environ.get('WEB_THREADS', SERVER_PROFILES[profile]['threads']))
+
+
+def worker_connections():
+    return int(os.environ.get('WORKER_CONNECTIONS', 1000))
+
+
+def request_concurrency(profile=None):
+    """Nombre maximal de requêtes traitées en même temps par un processus"""
+    profile = profile or server_profile()
+    if profile == 'gevent':
+        return worker_connections()
+    return worker_threads(profile)
+
+
+def engine_options(database_uri, profile=None):
+    """SQLALCHEMY_ENGINE_OPTIONS adaptées au profil (surchargeables par DB_POOL_*)"""
+    if database_uri.startswith('sqlite') and ':memory:' in database_uri:
+        return {}  # base en mémoire : pool statique imposé par Flask-SQLAlchemy
+
+    profile = profile or server_profile()
+    concurrency = request_concurrency(profile)
+    if profile == 'gevent':
+        pool_size = GEVENT_POOL_SIZE
+        max_overflow = GEVENT_POOL_SIZE
+    else:
+        pool_size = concurrency + BACKGROUND_THREADS
+        max_overflow = concurrency  # connexions ponctuelles (détection du moteur de recherche, exports)
+
+    return {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', pool_size)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', max_overflow)),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+        # Connexions coupées par le serveur (redémarrage, proxy) détectées avant usage
+        'pool_pre_ping': True,
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+    }
@@ -0,0 +1,84 @@
+"""
+SQLite en production : pragmas par connexion et écritures rejouées sur verrou
+
+Chaque nouvelle connexion passe en journal WAL (les lectures ne bloquent plus
+les écritures des autres workers), synchronous=NORMAL, attend les verrous
+SQLITE_BUSY_TIMEOUT ms et dispose d'un cache et d'un mmap plus grands.
+
+Le WAL ne suffit pas : une transaction qui a lu puis veut écrire alors qu'un
+autre worker a écrit entre-temps échoue aussitôt ("database is locked"), sans
+attendre. Les vues d'écriture décorées par @retry_on_lock sont alors rejouées
+depuis le début, transaction annulée.
+"""
+
+import copy
+import random
+import time
+from functools import wraps
+from flask import request, session
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+from app import app, db
+
+LOCK_MESSAGES = ('database is locked', 'database table is locked', 'database is busy')
+
+
+def sqlite_pragmas():
+    """PRAGMA exécutés à l'ouverture de chaque connexion, selon la configuration"""
+    pragmas = []
+    if app.config['SQLITE_WAL']:
+        pragmas.append('PRAGMA journal_mode=WAL')
+        pragmas.append('PRAGMA synchronous=NORMAL')
+    pragmas.append(f"PRAGMA busy_timeout={app.config['SQLITE_BUSY_TIMEOUT']}")
+    pragmas.append(f"PRAGMA cache_size=-{app.config['SQLITE_CACHE_SIZE_KB']}")
+    pragmas.append(f"PRAGMA mmap_size={app.config['SQLITE_MMAP_SIZE']}")
+    return pragmas
+
+
+def configure_sqlite(engine):
+    """Installe les pragmas sur le moteur s'il s'agit d'une base SQLite fichier"""
+    if engine.dialect.name != 'sqlite' or engine.url.database in (None, '', ':memory:'):
+        return False
+
+    pragmas = sqlite_pragmas()
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+    # Connexions déjà ouvertes (avant l'écouteur) : remplacées par des connexions configurées
+    engine.dispose()
+    return True
+
+
+def is_lock_error(error):
+    return any(message in str(error.orig).lower() for message in LOCK_MESSAGES)
+
+
+def retry_on_lock(view):
+    """Rejoue la vue si SQLite refuse l'écriture pour cause de verrou.
+
+    La vue doit pouvoir être rejouée : pas d'effet de bord hors base (fichier
+    enregistré, e-mail envoyé) avant son commit. La session Flask (panier
+    CART_BACKEND=session) est remise dans son état initial avant chaque essai.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        retries = app.config['SQLITE_WRITE_RETRIES']
+        snapshot = copy.deepcopy(dict(session)) if retries else None
+        for attempt in range(retries + 1):
+            try:
+                return view(*args, **kwargs)
+            except OperationalError as e:
+                if attempt == retries or not is_lock_error(e):
+                    raise
+                db.session.rollback()
+                session.clear()
+                session.update(copy.deepcopy(snapshot))
+                app.logger.info(f"Base verrouillée, nouvel essai {attempt + 1}/{retries} : {request.method} {request.path}")
+                # Attente exponentielle avec variation : les workers ne repartent pas ensemble
+                time.sleep(0.05 * 2 ** attempt * random.uniform(0.5, 1.5))
+    return wrapper
@@ -0,0 +1,106 @@
+"""
+Statistiques du dashboard maintenues incrémentalement
+"""
+
+from collections import Counter
+from datetime import datetime, timedelta
+from sqlalchemy import event, func, inspect, update
+from app import app, db
+from db_routing import use_primary
+from models import User, Product, Order, SiteStats
+
+STATS_ID = 1
+
+
+def _history(obj, attribute):
+    """(ancienne valeur, nouvelle valeur) si l'attribut a changé pendant ce flush, sinon None"""
+    history = inspect(obj).attrs[attribute].history
+    if not history.has_changes() or not history.deleted:
+        return None
+    return history.deleted[0], history.added[0] if history.added else None
+
+
+@event.listens_for(db.session, 'after_flush')
+def track_stats(session, flush_context):
+    """Traduit les insertions / suppressions / changements du flush en deltas de compteurs"""
+    deltas = Counter()
+    new_orders_by_user = Counter()
+
+    for obj in session.new:
+        if isinstance(obj, Product):
+            deltas['total_products'] += 1
+        elif isinstance(obj, User):
+            deltas['total_users'] += 1
+            deltas['admin_users'] += 1 if obj.is_admin else 0
+        elif isinstance(obj, Order):
+            deltas['total_orders'] += 1
+            deltas['pending_orders'] += 1 if (obj.status or 'pending') == 'pending' else 0
+            new_orders_by_user[obj.user_id] += 1
+
+    for obj in session.deleted:
+        if isinstance(obj, Product):
+            deltas['total_products'] -= 1
+        elif isinstance(obj, User):
+            deltas['total_users'] -= 1
+            deltas['admin_users'] -= 1 if obj.is_admin else 0
+        elif isinstance(obj, Order):
+            deltas['total_orders'] -= 1
+            deltas['pending_orders'] -= 1 if obj.status == 'pending' else 0
+
+    for obj in session.dirty:
+        if isinstance(obj, Order):
+            change = _history(obj, 'status')
+            if change:
+                deltas['pending_orders'] += (change[1] == 'pending') - (change[0] == 'pending')
+        elif isinstance(obj, User):
+            change = _history(obj, 'is_admin')
+            if change:
+                deltas['admin_users'] += bool(change[1]) - bool(change[0])
+
+    if not any(deltas.values()) and not new_orders_by_user:
+        return
+
+    connection = session.connection()
+
+    # Premier(s) achat(s) d'un client : il rejoint les "clients ayant commandé"
+    for user_id, count in new_orders_by_user.items():
+        total = connection.execute(
+            db.select(func.count(Order.id)).where(Order.user_id == user_id)
+        ).scalar()
+        if total == count:
+            deltas['users_with_orders'] += 1
+
+    values = {name: getattr(SiteStats, name) + delta for name, delta in deltas.items() if delta}
+    if values:
+        # UPDATE ... SET x = x + delta : sûr entre plusieurs workers
+        connection.execute(update(SiteStats).where(SiteStats.id == STATS_ID).values(**values))
+
+
+def reconcile_stats():
+    """Recalcule tous les compteurs depuis les tables (suppressions en masse, rattrapage)"""
+    # Ligne et compteurs lus sur la base principale : un réplica en retard ferait
+    # insérer une seconde ligne STATS_ID (IntegrityError) ou écrire des totaux périmés
+    with use_primary():
+        stats = db.session.get(SiteStats, STATS_ID)
+        if stats is None:
+            stats = SiteStats(id=STATS_ID)
+            db.session.add(stats)
+
+        stats.total_products = db.session.query(func.count(Product.id)).scalar()
+        stats.total_orders = db.session.query(func.count(Order.id)).scalar()
+        stats.total_users = db.session.query(func.count(User.id)).scalar()
+        stats.pending_orders = db.session.query(func.count(Order.id)).filter(Order.status == 'pending').scalar()
+        stats.admin_users = db.session.query(func.count(User.id)).filter(User.is_admin == True).scalar()
+        stats.users_with_orders = db.session.query(func.count(func.distinct(Order.user_id))).scalar()
+        stats.reconciled_at = datetime.utcnow()
+        db.session.commit()
+    return stats
+
+
+def get_site_stats():
+    """Ligne des compteurs ; recalculée si absente ou plus vieille que STATS_RECONCILE_INTERVAL"""
+    stats = db.session.get(SiteStats, STATS_ID)
+    max_age = timedelta(seconds=app.config['STATS_RECONCILE_INTERVAL'])
+    if stats is None or stats.reconciled_at is None or datetime.utcnow() - stats.reconciled_at > max_age:
+        stats = reconcile_stats()
+    return stats
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Décrément du stock au checkout quand une réservation est libérée en pleine vérification
+
+L'UPDATE groupé échoue (stock retenu par un autre panier), puis la réservation
+est libérée avant la seconde lecture du stock disponible : decrement_stock()
+doit quand même signaler un échec, sinon la commande serait créée sans que le
+stock ait été décrémenté.
+
+    python test_checkout_stock.py
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+INITIAL_STOCK = 5
+
+
+def run_scenario():
+    """Exécuté dans un processus dédié (base temporaire) ; affiche le résultat en JSON"""
+    from sqlalchemy import event
+    from app import app, create_app, db, init_db
+    from models import User, Product, StockReservation
+    from cart_service import price_cart, decrement_stock
+    from reservations import reserve
+
+    create_app()
+    init_db()
+    with app.app_context():
+        buyer = User(username='acheteur', email='acheteur@example.com', password_hash='x')
+        holder = User(username='panier', email='panier@example.com', password_hash='x')
+        product = Product(name='Parfum test', description='', price=50, stock=INITIAL_STOCK)
+        db.session.add_all([buyer, holder, product])
+        db.session.commit()
+        buyer_id, holder_id, product_id = buyer.id, holder.id, product.id
+
+        # Tout le stock est retenu par le panier d'un autre client
+        assert reserve(holder_id, product_id, INITIAL_STOCK)
+        db.session.commit()
+
+        # Entre l'UPDATE refusé et la seconde lecture : l'autre client vide son panier
+        @event.listens_for(db.session, 'after_rollback', once=True)
+        def release_other_cart(session):
+            with db.engine.begin() as connection:
+                connection.execute(StockReservation.__table__.delete().where(
+                    StockReservation.user_id == holder_id))
+
+        failed = decrement_stock(price_cart({str(product_id): 1}), buyer_id)
+        db.session.rollback()
+        stock = db.session.get(Product, product_id).stock
+
+    print(json.dumps({'failed': failed, 'stock': stock}))
+
+
+def test_released_reservation_is_not_a_success():
+    """Échec signalé et stock intact, même si la seconde lecture trouve du stock"""
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, RAILWAY_ENVIRONMENT='test', SECRET_KEY='checkout-stock-test',
+                   DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'checkout.db')}")
+        output = subprocess.run([sys.executable, __file__, '--run'], env=env,
+                                capture_output=True, text=True, check=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+
+    assert result['failed'], "decrement_stock() a retourné [] sans avoir décrémenté le stock"
+    assert result['stock'] == INITIAL_STOCK
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--run']:
+        run_scenario()
+    else:
+        try:
+            test_released_reservation_is_not_a_success()
+        except AssertionError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        print("✅ Échec signalé, stock inchangé")
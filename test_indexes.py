@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Vérifie avec EXPLAIN QUERY PLAN que les requêtes chaudes utilisent les index
+"""
+
+import sys
+from sqlalchemy import create_engine, select, text
+from app import db
+from models import Product, Order, OrderItem
+
+# (description, requête, index attendus : au moins un doit apparaître dans le plan)
+HOT_QUERIES = [
+    ("Catalogue filtré par catégorie et prix",
+     select(Product).where(Product.is_active == True, Product.category_id == 1, Product.price >= 10)
+     .order_by(Product.created_at, Product.id).limit(12),
+     ['ix_product_active_category_price']),
+    ("Produits similaires",
+     select(Product).where(Product.category_id == 1, Product.id != 5, Product.is_active == True).limit(4),
+     ['ix_product_active_category_price']),
+    ("Commandes admin (toutes)",
+     select(Order).order_by(Order.created_at.desc(), Order.id.desc()).limit(10),
+     ['ix_order_created_at_id']),
+    ("Commandes admin filtrées par statut",
+     select(Order).where(Order.status == 'pending').order_by(Order.created_at.desc(), Order.id.desc()).limit(10),
+     ['ix_order_status_created_at']),
+    ("Historique des commandes d'un client",
+     select(Order).where(Order.user_id == 1).order_by(Order.created_at.desc()),
+     ['ix_order_user_created_at']),
+    ("Articles des commandes (selectinload)",
+     select(OrderItem).where(OrderItem.order_id.in_([1, 2, 3])),
+     ['ix_order_item_order_id']),
+    ("Produit référencé dans des commandes",
+     select(OrderItem).where(OrderItem.product_id == 1),
+     ['ix_order_item_product_id']),
+]
+
+
+def query_plan(connection, statement):
+    sql = str(statement.compile(connection, compile_kwargs={'literal_binds': True}))
+    return ' | '.join(row[-1] for row in connection.execute(text(f"EXPLAIN QUERY PLAN {sql}")))
+
+
+def test_indexes():
+    """Chaque requête chaude doit passer par l'un des index attendus"""
+    engine = create_engine('sqlite://')
+    db.metadata.create_all(engine)
+
+    failures = []
+    with engine.connect() as connection:
+        for description, statement, expected in HOT_QUERIES:
+            plan = query_plan(connection, statement)
+            used = any(name in plan for name in expected)
+            print(f"{'✅' if used else '❌'} {description}\n   {plan}")
+            if not used:
+                failures.append(description)
+
+    assert not failures, f"Index non utilisés : {', '.join(failures)}"
+
+
+if __name__ == '__main__':
+    try:
+        test_indexes()
+    except AssertionError as e:
+        print(f"\n❌ {e}")
+        sys.exit(1)
+    print("\n✅ Toutes les requêtes chaudes utilisent un index")
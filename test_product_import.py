@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Validation des lignes d'import fournisseur : prix et stock non finis
+
+float() accepte « inf » et « nan » ; parse_row() doit les refuser par une
+ValueError (ligne en erreur dans le rapport) et non laisser passer une
+OverflowError (erreur 500 sur /admin/products/import, CLI interrompue).
+
+    python test_product_import.py
+"""
+
+import pytest
+
+from product_import import parse_row
+
+NON_FINITE = ['inf', '-inf', 'Infinity', 'nan', 'NaN']
+
+
+@pytest.mark.parametrize('value', NON_FINITE)
+def test_non_finite_price_is_rejected(value):
+    with pytest.raises(ValueError, match='prix invalide'):
+        parse_row({'name': 'Parfum', 'price': value}, {})
+
+
+@pytest.mark.parametrize('value', NON_FINITE)
+def test_non_finite_stock_is_rejected(value):
+    with pytest.raises(ValueError, match='stock invalide'):
+        parse_row({'name': 'Parfum', 'price': '10', 'stock': value}, {})
+
+
+def test_finite_values_are_accepted():
+    data = parse_row({'name': 'Parfum', 'price': '12,50', 'stock': '3.0'}, {})
+    assert data['price'] == 12.5
+    assert data['stock'] == 3
+
+
+if __name__ == '__main__':
+    import sys
+    sys.exit(pytest.main([__file__, '-q']))
@@ -30,7 +30,7 @@ def test_production():
     
     try:
         # Lancer l'application avec Gunicorn
-        cmd = ['gunicorn', '--config', 'gunicorn.conf.py', 'app:app']
+        cmd = ['gunicorn', '--config', 'gunicorn.conf.py', 'wsgi:app']
         process = subprocess.Popen(cmd, env=env)
         
         print(f"✅ Application démarrée avec PID {process.pid}")
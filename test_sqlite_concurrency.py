@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Commandes simultanées sur une base SQLite partagée par plusieurs processus
+
+Chaque processus joue le rôle d'un worker gunicorn : un client ajoute un
+produit au panier puis passe commande, en boucle, en même temps que les
+autres. Avec le mode production (WAL + écritures rejouées), aucune commande
+ne doit échouer et le stock final doit correspondre aux commandes passées.
+
+    python test_sqlite_concurrency.py          # compare l'ancien mode et le mode WAL
+"""
+
+import json
+import os
+import secrets
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+PROCESSES = 8
+CHECKOUTS = 25
+INITIAL_STOCK = 10000
+# Attente des verrous volontairement courte : la contention apparaît même sur une machine peu chargée
+BUSY_TIMEOUT_MS = 100
+
+
+def _env(db_path, production_mode):
+    return dict(
+        os.environ,
+        RAILWAY_ENVIRONMENT='test',
+        DATABASE_URL=f'sqlite:///{db_path}',
+        SECRET_KEY='sqlite-concurrency-test',
+        PAGE_CACHE_TTL='0',
+        SQLITE_BUSY_TIMEOUT=str(BUSY_TIMEOUT_MS),
+        SQLITE_WAL='1' if production_mode else '0',
+        SQLITE_WRITE_RETRIES=os.environ.get('SQLITE_WRITE_RETRIES', '3') if production_mode else '0',
+    )
+
+
+def setup_database():
+    """Schéma, un client par processus et un produit bien approvisionné"""
+    from app import app, create_app, db, init_db
+    from models import User, Product
+    from werkzeug.security import generate_password_hash
+    create_app()
+    init_db()
+    with app.app_context():
+        for index in range(PROCESSES):
+            db.session.add(User(username=f'client{index}', email=f'client{index}@example.com',
+                                password_hash=generate_password_hash('secret')))
+        db.session.add(Product(name='Parfum test', description='', price=50, stock=INITIAL_STOCK))
+        db.session.commit()
+
+
+def run_worker(index, start_at):
+    """Boucle ajout au panier + commande ; affiche le bilan en JSON"""
+    from sqlalchemy.exc import OperationalError
+    from app import app, create_app
+    from models import User, Product
+
+    create_app({'PROPAGATE_EXCEPTIONS': True})
+    with app.app_context():
+        user_id = User.query.filter_by(username=f'client{index}').one().id
+        product_id = Product.query.filter_by(name='Parfum test').one().id
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+
+    ok, errors = 0, []
+    time.sleep(max(0, start_at - time.time()))
+    for _ in range(CHECKOUTS):
+        try:
+            client.post('/add-to-cart', json={'product_id': product_id, 'quantity': 1})
+            response = client.post('/checkout', data={'address': '1 rue du Test', 'phone': '0600000000',
+                                                      'idempotency_key': secrets.token_urlsafe(16)})
+            if response.status_code == 302 and '/order-confirmation/' in response.location:
+                ok += 1
+            else:
+                errors.append(f'HTTP {response.status_code} -> {response.location}')
+        except OperationalError as e:
+            errors.append(str(e.orig))
+    print(json.dumps({'ok': ok, 'errors': errors}))
+
+
+def run_checkouts(production_mode):
+    """Lance PROCESSES workers en parallèle ; retourne (commandes réussies, erreurs, stock, articles vendus)"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'concurrency.db')
+        env = _env(db_path, production_mode)
+        subprocess.run([sys.executable, __file__, '--setup'], env=env, check=True)
+
+        start_at = time.time() + 5  # le temps que chaque processus importe l'application
+        workers = [
+            subprocess.Popen([sys.executable, __file__, '--worker', str(index), str(start_at)],
+                             env=env, stdout=subprocess.PIPE, text=True)
+            for index in range(PROCESSES)
+        ]
+        results = [json.loads(worker.communicate()[0].strip().splitlines()[-1]) for worker in workers]
+
+        connection = sqlite3.connect(db_path)
+        stock = connection.execute("SELECT stock FROM product WHERE name = 'Parfum test'").fetchone()[0]
+        sold = connection.execute('SELECT coalesce(sum(quantity), 0) FROM order_item').fetchone()[0]
+        connection.close()
+
+    ok = sum(result['ok'] for result in results)
+    errors = [error for result in results for error in result['errors']]
+    return ok, errors, stock, sold
+
+
+def test_parallel_checkouts():
+    """Mode production : toutes les commandes passent, le stock correspond aux articles vendus"""
+    ok, errors, stock, sold = run_checkouts(production_mode=True)
+    assert not errors, f"{len(errors)} commande(s) en échec : {errors[:3]}"
+    assert ok == PROCESSES * CHECKOUTS
+    assert stock == INITIAL_STOCK - sold
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--setup']:
+        setup_database()
+    elif sys.argv[1:2] == ['--worker']:
+        run_worker(int(sys.argv[2]), float(sys.argv[3]))
+    else:
+        print(f"🧪 {PROCESSES} processus x {CHECKOUTS} commandes simultanées")
+        for label, production_mode in (('Ancien mode (journal rollback)', False), ('Mode production (WAL)', True)):
+            ok, errors, stock, sold = run_checkouts(production_mode)
+            print(f"{'✅' if not errors else '❌'} {label} : {ok} commandes, {len(errors)} échec(s), "
+                  f"{sold} articles vendus, stock {stock}/{INITIAL_STOCK}")
+            for error in sorted(set(errors))[:3]:
+                print(f"   {error}")
+        sys.exit(1 if errors else 0)
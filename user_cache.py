@@ -0,0 +1,97 @@
+"""
+Identité de l'utilisateur connecté, servie par un cache LRU par processus
+
+current_user n'a besoin que de quelques colonnes (id, nom, e-mail, droits
+admin, date d'inscription) : le loader de Flask-Login reçoit un UserIdentity
+léger au lieu d'une ligne User complète, et ne lit la base qu'une fois toutes
+les USER_CACHE_TTL secondes par utilisateur et par processus.
+
+Une modification faite par l'admin (droits, suppression) invalide l'entrée du
+processus courant ; les autres workers peuvent servir l'ancienne identité
+pendant au plus USER_CACHE_TTL secondes.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from flask_login import UserMixin
+from app import app, db
+from models import User
+
+IDENTITY_COLUMNS = (User.id, User.username, User.email, User.is_admin, User.created_at)
+
+
+class UserIdentity(UserMixin):
+    """Colonnes de User utilisées par current_user ; partagé entre threads, ne pas modifier"""
+
+    def __init__(self, id, username, email, is_admin, created_at):
+        self.id = id
+        self.username = username
+        self.email = email
+        self.is_admin = bool(is_admin)
+        self.created_at = created_at
+
+    def __repr__(self):
+        return f'<UserIdentity {self.id} {self.username}>'
+
+
+class UserIdentityCache:
+    """LRU par processus avec expiration ; None (utilisateur supprimé) n'est pas mis en cache"""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                return entry[1]
+
+        row = db.session.query(*IDENTITY_COLUMNS).filter(User.id == user_id).first()
+        if row is None:
+            self.invalidate(user_id)
+            return None
+        identity = UserIdentity(*row)
+        if self.ttl > 0 and self.max_size > 0:
+            with self._lock:
+                self._entries[user_id] = (now + self.ttl, identity)
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return identity
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def size(self):
+        with self._lock:
+            return len(self._entries)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_identity_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = UserIdentityCache(app.config['USER_CACHE_SIZE'], app.config['USER_CACHE_TTL'])
+    return _cache
+
+
+def load_identity(user_id):
+    """Loader de Flask-Login : UserIdentity ou None si l'utilisateur n'existe plus"""
+    return get_identity_cache().get(user_id)
+
+
+def invalidate_user(user_id):
+    """À appeler après une modification de l'utilisateur (droits admin, suppression)"""
+    get_identity_cache().invalidate(user_id)